@@ -0,0 +1,131 @@
+"""
+What authentication costs a request, and what a login burst costs everyone else.
+
+1. Per-request overhead of ``get_user_id``: an in-process FastAPI app serves
+   one endpoint with and one without the dependency, with the token cache on
+   and off. No server or database is needed.
+2. Login burst: while N bcrypt verifications run, how long does a job handed
+   to the default threadpool (where sync endpoints and dependencies run) wait?
+   This compares verifying on that threadpool, as login used to, with the
+   dedicated bcrypt executor.
+
+    python -m benchmarks.auth_overhead --requests 2000 --logins 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+
+# Importing routes.auth loads the whole routes package, and with it the checker
+os.environ.setdefault("SECRET_KEY_ENCRYPTION", "benchmark-secret")
+os.environ.setdefault("POSTGRE_URL", "postgresql://benchmark@127.0.0.1/benchmark")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.openai.azure.com")
+os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-10-21")
+
+import httpx
+from fastapi import Depends, FastAPI
+from benchmarks.load_test import percentile
+from routes.auth import get_user_id, token_cache
+from utils.auth import averify_password, create_access_token, get_password_hash, verify_password
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/open")
+    async def open_endpoint():
+        return {"ok": True}
+
+    @app.get("/authed")
+    async def authed_endpoint(user_id: str = Depends(get_user_id)):
+        return {"ok": True}
+
+    return app
+
+
+async def timed_get(client: httpx.AsyncClient, path: str, headers: dict) -> float:
+    started = time.perf_counter()
+    response = await client.get(path, headers=headers)
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    return elapsed
+
+
+async def request_overhead(total: int) -> dict:
+    token = create_access_token({"user_id": "00000000-0000-0000-0000-00000000b0b0"}, timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=build_app())
+    baseline, uncached, cached = [], [], []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):  # warm up
+            await timed_get(client, "/authed", headers)
+        # Interleaved, so drift over the run hits every variant alike
+        for _ in range(total):
+            baseline.append(await timed_get(client, "/open", headers))
+            token_cache.clear()
+            uncached.append(await timed_get(client, "/authed", headers))
+            cached.append(await timed_get(client, "/authed", headers))
+
+    def overhead_us(latencies):
+        return round((percentile(latencies, 50) - percentile(baseline, 50)) * 1e6, 1)
+
+    return {
+        "baseline_p50_us": round(percentile(baseline, 50) * 1e6, 1),
+        "jwt_decode_overhead_us": overhead_us(uncached),
+        "cached_overhead_us": overhead_us(cached),
+    }
+
+
+async def threadpool_latency_during(burst) -> dict:
+    """Sample how long a no-op takes to get through the default threadpool while ``burst`` runs."""
+    samples = []
+    task = asyncio.ensure_future(burst)
+    while not task.done():
+        started = time.perf_counter()
+        await asyncio.to_thread(lambda: None)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.005)
+    await task
+    return {"p50_ms": round(percentile(samples, 50) * 1e3, 2), "p95_ms": round(percentile(samples, 95) * 1e3, 2)}
+
+
+async def login_burst(logins: int) -> dict:
+    hashed = get_password_hash("benchmark-password")
+    started = time.perf_counter()
+    verify_password("benchmark-password", hashed)
+    verify_ms = (time.perf_counter() - started) * 1e3
+
+    async def on_default_threadpool():
+        await asyncio.gather(*(asyncio.to_thread(verify_password, "benchmark-password", hashed) for _ in range(logins)))
+
+    async def on_bcrypt_executor():
+        await asyncio.gather(*(averify_password("benchmark-password", hashed) for _ in range(logins)))
+
+    return {
+        "logins": logins,
+        "bcrypt_verify_ms": round(verify_ms, 1),
+        "threadpool_wait_inline_bcrypt": await threadpool_latency_during(on_default_threadpool()),
+        "threadpool_wait_bcrypt_executor": await threadpool_latency_during(on_bcrypt_executor()),
+    }
+
+
+async def run(args) -> dict:
+    return {
+        "request_overhead": await request_overhead(args.requests),
+        "login_burst": await login_burst(args.logins),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark authentication overhead")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per variant")
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent password checks in the burst")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
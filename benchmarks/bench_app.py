@@ -0,0 +1,42 @@
+"""
+The API as ``main:app`` serves it, but with the LLM replaced by ``StubChatModel``
+and authentication bypassed, for ``benchmarks/load_test.py`` to run under uvicorn.
+
+Settings come from the environment:
+BENCH_LLM_LATENCY (seconds, default 2.0), BENCH_LLM_JITTER (default 0.5).
+
+No check touches the database, so POSTGRE_URL only needs to be a valid URL.
+"""
+import os
+
+# Placeholders only: the stub replaces AzureChatOpenAI before it is built, and no check touches the database
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.openai.azure.com")
+os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-10-21")
+os.environ.setdefault("POSTGRE_URL", "postgresql://benchmark@127.0.0.1/benchmark")
+if not os.environ.get("TIKTOKEN_CACHE_DIR"):
+    # tiktoken would download its encoding; estimate tokens from length instead
+    os.environ.setdefault("PROMPT_TOKENIZER", "")
+
+from main import app
+from database.connection import get_db
+from routes.auth import get_user_id
+from utils.checker_factory import get_harmful_checker
+from benchmarks.corpus_server import load_labels
+from benchmarks.stub_llm import StubChatModel
+
+BENCH_USER_ID = "00000000-0000-0000-0000-00000000b0b0"
+
+get_harmful_checker().llm = StubChatModel(
+    labels=load_labels(),
+    latency=float(os.getenv("BENCH_LLM_LATENCY", "2.0")),
+    jitter=float(os.getenv("BENCH_LLM_JITTER", "0.5")),
+)
+
+
+def _no_db():
+    yield None
+
+
+app.dependency_overrides[get_user_id] = lambda: BENCH_USER_ID
+app.dependency_overrides[get_db] = _no_db
@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def load_labels(corpus_dir: Path = CORPUS_DIR) -> dict[str, bool]:
+    """
+    :return: Expected ``is_harmful`` per page; pages missing from manifest.json count as benign
+    """
+    manifest = corpus_dir / "manifest.json"
+    labels = json.loads(manifest.read_text()) if manifest.exists() else {}
+    return {page.name: labels.get(page.name, False) for page in sorted(corpus_dir.glob("*.html"))}
+
+
+class _CorpusHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CorpusServer:
+    """
+    Serves the recorded pages on 127.0.0.1 so benchmarks never touch the internet.
+
+    Anything not in the corpus (trackers, images on other hosts) fails to load,
+    which is also what a blocked request looks like to the checker.
+    """
+
+    def __init__(self, corpus_dir: Path = CORPUS_DIR, port: int = 0, latency: float = 0.0):
+        """
+        :param port: Port to listen on, 0 picks a free one
+        :param latency: Seconds added to every response, to mimic a remote site
+        """
+        self.corpus_dir = corpus_dir
+        handler = type("CorpusHandler", (_CorpusHandler,), {"latency": latency})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), partial(handler, directory=str(corpus_dir)))
+        self.thread = threading.Thread(target=self.server.serve_forever, name="corpus-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def urls(self) -> list[str]:
+        return [f"{self.base_url}/{name}" for name in load_labels(self.corpus_dir)]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
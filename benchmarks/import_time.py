@@ -0,0 +1,100 @@
+"""
+How long ``import main`` takes in a fresh interpreter, and which imports cost the most.
+
+Each run starts a new ``python -X importtime -c "import main"``. The report
+has the median import time across runs and the slowest top-level packages.
+It also lists which of ``--forbid`` got imported: these are only meant to
+load once a check needs them, not at startup.
+
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --max-ms 1500   # exit 1 on regression
+
+No connection is made, so placeholder settings are enough.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PLACEHOLDER_ENV = {
+    "POSTGRE_URL": "postgresql://benchmark@127.0.0.1/benchmark",
+    "AZURE_OPENAI_API_KEY": "benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://benchmark.openai.azure.com",
+    "AZURE_OPENAI_API_VERSION": "2024-10-21",
+    "SECRET_KEY_ENCRYPTION": "benchmark-secret",
+}
+DEFAULT_FORBID = ["langchain", "langchain_core", "langchain_openai", "openai", "playwright", "PIL"]
+
+
+def import_once(module: str) -> dict[str, tuple[int, int]]:
+    """
+    :return: Every module imported, as name -> (self microseconds, cumulative microseconds)
+    """
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # the header line
+        modules[fields[2].strip()] = (own, cumulative)
+    return modules
+
+
+def run(module: str, runs: int, top: int, forbid: list[str]) -> dict:
+    totals, last = [], {}
+    for _ in range(runs):
+        last = import_once(module)
+        totals.append(last[module][1])
+    # Top-level packages pulled in by the module, by cumulative time of the last run
+    packages: dict[str, int] = {}
+    for name, (_, cumulative) in last.items():
+        if name != module and "." not in name:
+            packages[name] = cumulative
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "slowest_packages_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "forbidden_imported": [name for name in forbid if name in last],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the API")
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBID, help="Packages that must not be imported at startup")
+    parser.add_argument("--max-ms", type=float, help="Exit 1 if the median import time exceeds this")
+    args = parser.parse_args(argv)
+
+    report = run(args.module, args.runs, args.top, args.forbid)
+    print(json.dumps(report, indent=2))
+    failed = False
+    if report["forbidden_imported"]:
+        print(f"Imported at startup: {', '.join(report['forbidden_imported'])}", file=sys.stderr)
+        failed = True
+    if args.max_ms is not None and report["median_ms"] > args.max_ms:
+        print(f"Median import time {report['median_ms']} ms exceeds {args.max_ms} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
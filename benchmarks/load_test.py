@@ -0,0 +1,265 @@
+"""
+Offline load test for POST /api/v1/check_harmful.
+
+Starts the corpus server and ``benchmarks.bench_app:app`` under uvicorn, fires
+requests at a fixed concurrency and reports latency percentiles, throughput,
+peak memory of the server and its browsers, and how many browser processes
+ran. Nothing leaves 127.0.0.1: pages come from ``benchmarks/corpus`` and the
+LLM is ``StubChatModel``.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16
+    python -m benchmarks.load_test --json before.json
+    python -m benchmarks.load_test --max-p95 8 --max-rss-mb 1500   # exit 1 on regression
+
+Process stats are read from /proc, so they are only reported on Linux. Note
+that every module calls ``load_dotenv(override=True)``: a .env file in the
+working directory wins over the settings passed here.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import httpx
+from benchmarks.corpus_server import CorpusServer, load_labels
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _read_status(pid: int) -> dict:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return dict(line.rstrip("\n").split(":\t", 1) for line in f if ":\t" in line)
+    except OSError:
+        return {}
+
+
+def _descendants(root: int) -> list[int]:
+    children: dict[int, list[int]] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        ppid = _read_status(int(entry.name)).get("PPid")
+        if ppid:
+            children.setdefault(int(ppid), []).append(int(entry.name))
+    found, stack = [], [root]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+class ProcessSampler:
+    """Samples RSS of the server process tree and counts browser processes in the background."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_tree_rss_kb = 0
+        self.peak_browsers = 0
+        self.supported = Path("/proc/self/status").exists()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="process-sampler", daemon=True)
+
+    def sample(self) -> None:
+        pids = [self.pid] + _descendants(self.pid)
+        rss_kb, browsers = 0, 0
+        for pid in pids:
+            status = _read_status(pid)
+            rss_kb += int(status.get("VmRSS", "0 kB").split()[0])
+            if any(name in status.get("Name", "") for name in BROWSER_PROCESS_NAMES):
+                browsers += 1
+        self.peak_tree_rss_kb = max(self.peak_tree_rss_kb, rss_kb)
+        self.peak_browsers = max(self.peak_browsers, browsers)
+
+    def server_peak_rss_kb(self) -> int:
+        return int(_read_status(self.pid).get("VmHWM", "0 kB").split()[0])
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        if self.supported:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.supported:
+            self._thread.join()
+            self.sample()
+
+
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "benchmarks.bench_app:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=REPO_ROOT, env={**os.environ, **env})
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 120) -> None:
+    """
+    Wait until the checker is warmed up, so browser startup is not timed as request latency.
+    ``/ready`` answers 503 without a database, so only its ``checker`` field is looked at.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} during startup")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=5).json().get("checker"):
+                return
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+async def run_load(base_url: str, urls: list[str], labels: dict[str, bool], total: int, concurrency: int,
+                   bypass_cache: bool, timeout: float) -> dict:
+    """
+    :return: Latencies of successful requests plus counts of errors and verdicts that disagree with the corpus
+    """
+    latencies, errors, mismatches = [], 0, 0
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index, errors, mismatches
+        while next_index < total:
+            url = urls[next_index % len(urls)]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/check_harmful", json={"url": url, "bypass_cache": bypass_cache})
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            if response.json().get("is_harmful") != labels[url.rsplit("/", 1)[-1]]:
+                mismatches += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return {"latencies": latencies, "errors": errors, "mismatches": mismatches, "wall": wall}
+
+
+def summarize(load: dict, sampler: Optional[ProcessSampler], args) -> dict:
+    latencies = load["latencies"]
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "ok": len(latencies),
+        "errors": load["errors"],
+        "verdict_mismatches": load["mismatches"],
+        "requests_per_second": round(len(latencies) / load["wall"], 2) if load["wall"] else 0.0,
+        "p50_seconds": round(percentile(latencies, 50), 3),
+        "p95_seconds": round(percentile(latencies, 95), 3),
+        "p99_seconds": round(percentile(latencies, 99), 3),
+        "max_seconds": round(max(latencies, default=0.0), 3),
+    }
+    if sampler and sampler.supported:
+        report["server_peak_rss_mb"] = round(sampler.server_peak_rss_kb() / 1024, 1)
+        report["total_peak_rss_mb"] = round(sampler.peak_tree_rss_kb / 1024, 1)
+        report["peak_browser_processes"] = sampler.peak_browsers
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the harmful content checker")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--use-cache", action="store_true", help="Let repeated pages hit the verdict cache and fingerprint index")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Mean seconds per stub LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="Uniform +/- seconds on the LLM latency")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="Seconds added to every corpus response")
+    parser.add_argument("--no-prefilter", action="store_true", help="Send every page through the browser and LLM")
+    parser.add_argument("--pool-size", type=int, help="BROWSER_POOL_SIZE for the server")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    parser.add_argument("--max-p95", type=float, help="Exit 1 if p95 latency exceeds this many seconds")
+    parser.add_argument("--max-rss-mb", type=float, help="Exit 1 if peak RSS of server plus browsers exceeds this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    env = {
+        "BENCH_LLM_LATENCY": str(args.llm_latency),
+        "BENCH_LLM_JITTER": str(args.llm_jitter),
+        "PREFILTER_ENABLED": "false" if args.no_prefilter else "true",
+        "VERDICT_CACHE_DB": "false",
+        "SCAN_HISTORY_ENABLED": "false",
+        # Repeats of a corpus page would otherwise skip the LLM by content
+        "FINGERPRINT_ENABLED": "true" if args.use_cache else "false",
+    }
+    if args.pool_size:
+        env["BROWSER_POOL_SIZE"] = str(args.pool_size)
+
+    with CorpusServer(latency=args.page_latency) as corpus:
+        urls = corpus.urls()
+        labels = load_labels()
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(port, env)
+        try:
+            wait_until_ready(base_url, server)
+            with ProcessSampler(server.pid) as sampler:
+                load = asyncio.run(run_load(
+                    base_url, urls, labels, args.requests, args.concurrency,
+                    bypass_cache=not args.use_cache, timeout=args.timeout,
+                ))
+            report = summarize(load, sampler, args)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    print(json.dumps(report, indent=2))
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+
+    failed = report["errors"] > 0
+    if args.max_p95 is not None and report["p95_seconds"] > args.max_p95:
+        print(f"p95 {report['p95_seconds']}s exceeds {args.max_p95}s", file=sys.stderr)
+        failed = True
+    if args.max_rss_mb is not None and report.get("total_peak_rss_mb", 0) > args.max_rss_mb:
+        print(f"Peak RSS {report['total_peak_rss_mb']} MB exceeds {args.max_rss_mb} MB", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
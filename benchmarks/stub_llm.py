@@ -0,0 +1,59 @@
+import asyncio
+import random
+from typing import Optional
+from urllib.parse import urlsplit
+from langchain_core.messages import AIMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+
+
+class StubChatModel:
+    """
+    Stand-in for AzureChatOpenAI that answers from the corpus labels after a
+    configurable delay, so benchmarks exercise the whole pipeline offline.
+
+    Only the part of the chat model interface the checker uses is implemented:
+    ``with_structured_output(schema, include_raw=True)``.
+    """
+
+    def __init__(self, labels: dict[str, bool], latency: float = 2.0, jitter: float = 0.5, seed: Optional[int] = None):
+        """
+        :param labels: Expected verdict per corpus file name (``is_harmful``)
+        :param latency: Mean seconds per call
+        :param jitter: Uniform +/- seconds added to ``latency``
+        """
+        self.labels = labels
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _page_name(self, prompt: PromptValue) -> str:
+        for message in prompt.to_messages():
+            parts = message.content if isinstance(message.content, list) else [message.content]
+            for part in parts:
+                text = part.get("text", "") if isinstance(part, dict) else part
+                for line in text.splitlines():
+                    if line.startswith("url: "):
+                        return urlsplit(line[5:].strip()).path.rsplit("/", 1)[-1]
+        return ""
+
+    def with_structured_output(self, schema, include_raw: bool = False):
+        async def answer(prompt: PromptValue):
+            self.calls += 1
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+            name = self._page_name(prompt)
+            is_harmful = self.labels.get(name, False)
+            parsed = schema(
+                is_harmful=is_harmful,
+                summary_harmful=f"Stub verdict for {name or 'unknown page'}.",
+            )
+            if not include_raw:
+                return parsed
+            raw = AIMessage(
+                content=parsed.model_dump_json(),
+                usage_metadata={"input_tokens": 1500, "output_tokens": 40, "total_tokens": 1540},
+            )
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+        return RunnableLambda(answer)
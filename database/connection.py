@@ -1,4 +1,7 @@
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -8,10 +11,52 @@ load_dotenv(override=True)
 
 POSTGRESQL_URL = getenv("POSTGRE_URL")
 
-engine = create_engine(POSTGRESQL_URL)
+# Pool settings. Postgres is reached through a tunnel that drops idle
+# connections, so connections are pinged before use and recycled well before
+# the tunnel times them out. Every process gets its own pools: keep
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) * processes below the server's max_connections.
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "300"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_CONNECT_TIMEOUT = int(getenv("DB_CONNECT_TIMEOUT", "10"))  # seconds
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+
+def to_async_url(url: str):
+    """Point a postgres URL at asyncpg, translating the libpq-only ``sslmode`` option."""
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    if "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+
+# Neither engine connects until it is first used
+engine = create_engine(POSTGRESQL_URL, connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}, **POOL_OPTIONS)
+
+async_engine = create_async_engine(
+    getenv("ASYNC_POSTGRE_URL") or to_async_url(POSTGRESQL_URL),
+    connect_args={"timeout": DB_CONNECT_TIMEOUT},
+    **POOL_OPTIONS,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay readable after commit, since lazy loads are not possible in async code.
+# asyncpg connections belong to the event loop that opened them: use these
+# sessions from the API (or worker) loop only, never from checker_loop.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -20,4 +65,25 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def aping(timeout: float = DB_CONNECT_TIMEOUT) -> bool:
+    """
+    :param timeout: Seconds to wait for the database
+    :return: Whether a query got through within ``timeout``
+    """
+    async def select_one():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(select_one(), timeout)
+        return True
+    except Exception:
+        return False
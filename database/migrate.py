@@ -0,0 +1,55 @@
+"""
+Create the tables and indexes that do not exist yet.
+
+Run once per deploy, before starting the API or the workers:
+
+    python -m database.migrate
+
+The container image does this in its start command before ``python main.py``.
+
+Existing tables are left as they are; changed columns still need a manual
+migration. Setting DB_CREATE_SCHEMA=true makes the API do the same on startup
+instead, which is handy for local development.
+"""
+import time
+from os import getenv
+from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
+from database.connection import Base, async_engine, engine
+from logging_config import logger
+import database.models  # noqa: F401  registers every table on Base.metadata
+
+load_dotenv(override=True)
+
+# Configurations
+DB_CREATE_SCHEMA = getenv("DB_CREATE_SCHEMA", "false").lower() == "true"
+MIGRATE_CONNECT_ATTEMPTS = int(getenv("MIGRATE_CONNECT_ATTEMPTS", "10"))  # the database may still be coming up
+MIGRATE_CONNECT_INTERVAL = float(getenv("MIGRATE_CONNECT_INTERVAL", "3"))  # seconds between attempts
+
+
+def create_schema() -> None:
+    Base.metadata.create_all(engine)
+    logger.info(f"[Migrate] Schema up to date ({len(Base.metadata.tables)} tables)")
+
+
+async def acreate_schema() -> None:
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    logger.info(f"[Migrate] Schema up to date ({len(Base.metadata.tables)} tables)")
+
+
+def main() -> None:
+    """Create the schema, waiting for the database to accept connections (the container starts its tunnel alongside)."""
+    for attempt in range(1, MIGRATE_CONNECT_ATTEMPTS + 1):
+        try:
+            create_schema()
+            return
+        except OperationalError as e:
+            if attempt == MIGRATE_CONNECT_ATTEMPTS:
+                raise
+            logger.warning(f"[Migrate] Database not reachable (attempt {attempt}/{MIGRATE_CONNECT_ATTEMPTS}): {e}")
+            time.sleep(MIGRATE_CONNECT_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, String, Integer, SmallInteger, Boolean, Date, DateTime, ForeignKey, UniqueConstraint, func, text
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, String, Integer, SmallInteger, BigInteger, Boolean, Date, DateTime, ForeignKey, UniqueConstraint, Index, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSONB
 import uuid
-from database.connection import Base, engine
+from database.connection import Base
 
 class User(Base):
     __tablename__ = "users"
@@ -88,4 +88,65 @@ class UserCollection(Base):
     user_condition_summary = Column(JSONB, nullable=False)
     num_quiz_attempt = Column(Integer, default=0)
 
-Base.metadata.create_all(engine)
\ No newline at end of file
+class CachedVerdict(Base):
+    __tablename__ = "verdict_cache"
+    url_key = Column(String, primary_key=True)  # normalized URL
+    is_harmful = Column(Boolean, nullable=False)
+    summary_harmful = Column(String, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class CheckJob(Base):
+    __tablename__ = "check_jobs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
+    submitter_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=False, server_default=text("'{}'"))  # everyone who may read the job
+    url = Column(String, nullable=False)
+    url_key = Column(String, nullable=False)  # normalized URL
+    priority = Column(SmallInteger, nullable=False, default=0)  # 0 = interactive, 1 = bulk
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, failed
+    bypass_cache = Column(Boolean, nullable=False, default=False)
+    attempts = Column(SmallInteger, nullable=False, default=0)
+    max_attempts = Column(SmallInteger, nullable=False, default=3)
+    result = Column(JSONB)
+    error = Column(String)
+    available_at = Column(DateTime, nullable=False, default=func.now())
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    __table_args__ = (
+        Index("ix_check_jobs_claim", "status", "priority", "available_at"),
+        # At most one active job per URL; submissions of the same URL join it
+        Index("ux_check_jobs_active_url", "url_key", unique=True, postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+class ScanResult(Base):
+    __tablename__ = "scan_results"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
+    url = Column(String, nullable=False)
+    url_key = Column(String, nullable=False)  # normalized URL
+    domain = Column(String, nullable=False)  # site key, see utils.urls.site_key
+    is_harmful = Column(Boolean, nullable=False)
+    summary_harmful = Column(String, nullable=False)
+    tier = Column(String(20), nullable=False)  # what decided the verdict: llm, fingerprint, ...
+    model = Column(String(50))  # LLM deployment, if the LLM decided
+    content_hash = Column(String(64))
+    perceptual_hash = Column(BigInteger)  # dHash of the top screenshot, as a signed 64-bit value
+    timings = Column(JSONB)  # milliseconds per stage
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    __table_args__ = (
+        # Latest verdict for a URL or a domain
+        Index("ix_scan_results_url_key_created", "url_key", created_at.desc()),
+        Index("ix_scan_results_domain_created", "domain", created_at.desc()),
+        Index("ix_scan_results_content_hash", "content_hash"),
+    )
+
+class DomainReputation(Base):
+    __tablename__ = "domain_reputation"
+    domain = Column(String, primary_key=True)  # site key, see utils.urls.site_key
+    scans = Column(Integer, nullable=False, default=0)
+    harmful = Column(Integer, nullable=False, default=0)
+    last_harmful_summary = Column(String)
+    last_scanned_at = Column(DateTime, nullable=False, default=func.now())
+    last_harmful_at = Column(DateTime)
@@ -0,0 +1,320 @@
+"""
+Run the API and the scrapers as separate process tiers.
+
+    python deploy.py --api-workers 4 --scrapers 2 --scraper-concurrency 8
+
+The API tier is uvicorn with ``--api-workers`` processes, each using a
+``RemoteHarmfulChecker``. The scraper tier is ``--scrapers`` processes, each
+owning its own browser pool and LLM client and running up to
+``--scraper-concurrency`` checks at once. The tiers talk over a local queue
+served from this process. On SIGTERM or Ctrl+C the API stops taking requests
+and finishes those in flight, then the scrapers finish every check they hold
+and close their browsers.
+
+With METRICS_ENABLED=true, the API's /metrics only has the queue counters
+of the worker that answered. Stage timings, tier decisions and browser pool
+gauges are served by each scraper on ``--scraper-metrics-port`` + its index.
+
+Every module calls ``load_dotenv(override=True)``, so CHECKER_MODE,
+SCRAPER_IPC_ADDRESS and SCRAPER_IPC_AUTHKEY must not be set in .env.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from os import getenv
+from dotenv import load_dotenv
+from logging_config import logger
+from utils.remote_checker import (
+    SCRAPER_IPC_ADDRESS, SCRAPER_IPC_AUTHKEY, SCRAPER_QUEUE_SIZE, CheckQueueManager, encode_error, parse_address,
+)
+
+load_dotenv(override=True)
+
+# Configurations
+DEPLOY_API_WORKERS = int(getenv("DEPLOY_API_WORKERS", "2"))
+DEPLOY_SCRAPERS = int(getenv("DEPLOY_SCRAPERS", "1"))
+DEPLOY_SCRAPER_CONCURRENCY = int(getenv("DEPLOY_SCRAPER_CONCURRENCY", "8"))  # checks in flight per scraper process
+DEPLOY_DRAIN_TIMEOUT = int(getenv("DEPLOY_DRAIN_TIMEOUT", "60"))  # seconds each tier gets to finish its checks
+DEPLOY_SCRAPER_METRICS_PORT = int(getenv("DEPLOY_SCRAPER_METRICS_PORT", "9101"))  # scraper i serves /metrics on this + i, 0 disables
+DEPLOY_REPLY_QUEUE_IDLE = int(getenv("DEPLOY_REPLY_QUEUE_IDLE", "60"))  # seconds without reads before an API worker's replies are dropped
+
+
+class _CheckQueueServer(BaseManager):
+    pass
+
+
+class ReplyQueues:
+    """
+    Reply queues of the API workers, by worker name.
+
+    A worker opens its queue when it connects and closes it when it shuts
+    down. Uvicorn replaces a crashed worker with a new process (and name), so
+    whenever a worker connects, queues nobody has read from for
+    ``idle_timeout`` seconds are removed too; live workers poll theirs every
+    second. Replies to a worker without a queue are dropped.
+    """
+
+    def __init__(self, idle_timeout: float = DEPLOY_REPLY_QUEUE_IDLE):
+        self.idle_timeout = idle_timeout
+        self._queues: dict[str, queue.Queue] = {}
+        self._read_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def open(self, name: str) -> None:
+        with self._lock:
+            self._queues.setdefault(name, queue.Queue())
+            self._read_at[name] = time.monotonic()
+            self._drop_idle()
+
+    def close(self, name: str) -> None:
+        with self._lock:
+            self._queues.pop(name, None)
+            self._read_at.pop(name, None)
+
+    def put(self, name: str, message: tuple) -> bool:
+        """:return: Whether worker ``name`` still has a queue to take the message"""
+        with self._lock:
+            replies = self._queues.get(name)
+        if replies is None:
+            return False
+        replies.put(message)
+        return True
+
+    def get(self, name: str, timeout: float) -> tuple:
+        """:raises queue.Empty: If nothing came within ``timeout`` seconds"""
+        with self._lock:
+            replies = self._queues.setdefault(name, queue.Queue())
+            self._read_at[name] = time.monotonic()
+        return replies.get(timeout=timeout)
+
+    def _drop_idle(self) -> None:
+        now = time.monotonic()
+        for name, read_at in list(self._read_at.items()):
+            if now - read_at > self.idle_timeout:
+                logger.warning(f"[Deploy] {name} stopped reading its replies, dropping its queue")
+                del self._queues[name], self._read_at[name]
+
+
+def serve_queues(address: str, authkey: str) -> tuple[object, str]:
+    """
+    Serve the check queue, the reply queues and the cancel queues from a thread of this process.
+
+    :return: The manager server and the address it listens on
+    """
+    checks = queue.Queue(SCRAPER_QUEUE_SIZE)
+    reply_queues = ReplyQueues()
+    cancels: dict[str, queue.Queue] = {}
+    lock = threading.Lock()
+
+    def cancel_queue(name: str) -> queue.Queue:
+        with lock:
+            return cancels.setdefault(name, queue.Queue())
+
+    _CheckQueueServer.register("checks", callable=lambda: checks)
+    _CheckQueueServer.register("reply_queues", callable=lambda: reply_queues)
+    _CheckQueueServer.register("cancels", callable=cancel_queue)
+    server = _CheckQueueServer(parse_address(address), authkey=authkey.encode()).get_server()
+    threading.Thread(target=server.serve_forever, name="check-queues", daemon=True).start()
+    host, port = server.address
+    return server, f"{host}:{port}"
+
+
+def run_scraper(index: int, address: str, authkey: str, concurrency: int, metrics_port: int, draining) -> None:
+    """Entry point of a scraper process: take checks from the queue until ``draining`` is set, then finish them."""
+    # Ctrl+C reaches the whole process group; the supervisor decides when scrapers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from utils import metrics
+    from utils.browser_pool import browser_pool
+    from utils.checker import HarmfulChecker
+    from utils.extraction import load_encoding
+
+    checker = HarmfulChecker()
+    load_encoding()
+    if metrics_port:
+        metrics.register_checker(checker.stats, browser_pool.stats)
+        try:
+            metrics.serve(metrics_port)
+        except OSError as e:
+            logger.error(f"[Scraper {index}] Failed to serve metrics on port {metrics_port}: {e}")
+    try:
+        browser_pool.start()
+    except Exception as e:
+        # The pool retries its startup on the first check
+        logger.error(f"[Scraper {index}] Failed to warm up browser pool: {e}")
+    name = f"scraper-{index}"
+    manager = CheckQueueManager(parse_address(address), authkey=authkey.encode())
+    manager.connect()
+    checks = manager.checks()
+    cancels = manager.cancels(name)
+    reply_queues = manager.reply_queues()
+    # One thread sends every reply, so each check's events arrive in order and before its result
+    sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replies")
+    running: dict[tuple[str, int], asyncio.Task] = {}  # only touched on the checker loop
+    slots = threading.BoundedSemaphore(concurrency)
+    stopped = threading.Event()
+
+    def reply(reply_to: str, message: tuple, url: str) -> None:
+        def done(future) -> None:
+            if future.exception() is not None:
+                logger.error(f"[Scraper {index}] Failed to reply to {reply_to} for {url}: {future.exception()}")
+            elif not future.result() and message[1] != "event":
+                logger.warning(f"[Scraper {index}] {reply_to} is gone, dropped its reply for {url}")
+
+        sender.submit(reply_queues.put, reply_to, message).add_done_callback(done)
+
+    async def run(job: tuple) -> None:
+        job_id, reply_to, url, bypass_cache, user_id, stream = job
+        running[reply_to, job_id] = asyncio.current_task()
+        reply(reply_to, (job_id, "started", name), url)
+        try:
+            if stream:
+                async for event in checker.astream_check(url, bypass_cache=bypass_cache, user_id=user_id):
+                    if event["event"] == "result":
+                        verdict = event["result"]
+                    else:
+                        reply(reply_to, (job_id, "event", event), url)
+            else:
+                verdict = await checker.aharmful_checker(url, bypass_cache=bypass_cache, user_id=user_id)
+            message = (job_id, "result", verdict.model_dump() if verdict is not None else None)
+        except Exception as e:
+            message = (job_id, "error", encode_error(e))
+        except asyncio.CancelledError:
+            logger.info(f"[Scraper {index}] Cancelled the check of {url} for {reply_to}")
+            return
+        finally:
+            running.pop((reply_to, job_id), None)
+        reply(reply_to, message, url)
+
+    def cancel(key: tuple[str, int]) -> None:
+        task = running.get(key)
+        if task is not None:
+            task.cancel()
+
+    def read_cancels() -> None:
+        while not stopped.is_set():
+            try:
+                reply_to, job_id = cancels.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            browser_pool.loop.loop.call_soon_threadsafe(cancel, (reply_to, job_id))
+
+    threading.Thread(target=read_cancels, name="check-cancels", daemon=True).start()
+
+    logger.info(f"[Scraper {index}] Ready for {concurrency} concurrent check(s)")
+    while not draining.is_set():
+        if not slots.acquire(timeout=1):
+            continue
+        try:
+            job = checks.get(timeout=1)
+        except queue.Empty:
+            slots.release()
+            continue
+        except (EOFError, OSError) as e:
+            logger.error(f"[Scraper {index}] Lost the check queue: {e}")
+            slots.release()
+            break
+        browser_pool.loop.submit(run(job)).add_done_callback(lambda _: slots.release())
+
+    logger.info(f"[Scraper {index}] Draining")
+    for _ in range(concurrency):
+        slots.acquire()
+    stopped.set()
+    sender.shutdown()
+    checker.close()
+    browser_pool.shutdown()
+    logger.info(f"[Scraper {index}] Stopped")
+
+
+def start_api(host: str, port: int, workers: int, drain_timeout: int, address: str, authkey: str) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port),
+        "--workers", str(workers), "--timeout-graceful-shutdown", str(drain_timeout),
+    ]
+    env = {**os.environ, "CHECKER_MODE": "remote", "SCRAPER_IPC_ADDRESS": address, "SCRAPER_IPC_AUTHKEY": authkey}
+    # Own session, so Ctrl+C reaches only this process and the API gets exactly one SIGTERM
+    return subprocess.Popen(command, env=env, start_new_session=True)
+
+
+def main(args) -> int:
+    authkey = SCRAPER_IPC_AUTHKEY or secrets.token_hex(16)
+    server, address = serve_queues(args.ipc_address, authkey)
+    context = multiprocessing.get_context("spawn")
+    draining = context.Event()
+
+    def start_scraper(index: int):
+        process = context.Process(
+            target=run_scraper,
+            args=(index, address, authkey, args.scraper_concurrency,
+                  args.scraper_metrics_port + index if args.scraper_metrics_port else 0, draining),
+            name=f"scraper-{index}",
+        )
+        process.start()
+        return process
+
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    scrapers = [start_scraper(i) for i in range(args.scrapers)]
+    api = start_api(args.host, args.port, args.api_workers, args.drain_timeout, address, authkey)
+    logger.info(
+        f"[Deploy] {args.api_workers} API worker(s) on {args.host}:{args.port}, "
+        f"{args.scrapers} scraper(s) x {args.scraper_concurrency} checks, queue at {address}"
+    )
+
+    exit_code = 0
+    while not stopping.wait(1):
+        if api.poll() is not None:
+            logger.error(f"[Deploy] API exited with code {api.returncode}")
+            exit_code = 1
+            break
+        for i, process in enumerate(scrapers):
+            if not process.is_alive():
+                # Checks it held are lost; their callers time out
+                logger.error(f"[Deploy] Scraper {i} exited with code {process.exitcode}, restarting")
+                scrapers[i] = start_scraper(i)
+
+    logger.info("[Deploy] Shutting down, draining the API first")
+    if api.poll() is None:
+        api.terminate()
+        try:
+            api.wait(timeout=args.drain_timeout + 10)
+        except subprocess.TimeoutExpired:
+            logger.error("[Deploy] API did not stop in time, killing it")
+            api.kill()
+            api.wait()
+    draining.set()
+    for i, process in enumerate(scrapers):
+        process.join(args.drain_timeout)
+        if process.is_alive():
+            logger.error(f"[Deploy] Scraper {i} did not drain in time, terminating it")
+            process.terminate()
+            process.join()
+    server.stop_event.set()
+    logger.info("[Deploy] Stopped")
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API and the scrapers as separate process tiers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--api-workers", type=int, default=DEPLOY_API_WORKERS, help="uvicorn worker processes")
+    parser.add_argument("--scrapers", type=int, default=DEPLOY_SCRAPERS, help="Scraper processes, each with its own browser pool")
+    parser.add_argument("--scraper-concurrency", type=int, default=DEPLOY_SCRAPER_CONCURRENCY, help="Checks in flight per scraper")
+    parser.add_argument("--drain-timeout", type=int, default=DEPLOY_DRAIN_TIMEOUT, help="Seconds each tier gets to finish its checks on shutdown")
+    parser.add_argument("--scraper-metrics-port", type=int, default=DEPLOY_SCRAPER_METRICS_PORT, help="Scraper i serves /metrics on this + i, 0 disables")
+    parser.add_argument("--ipc-address", default=SCRAPER_IPC_ADDRESS, help="host:port of the check queue, port 0 picks a free one")
+    sys.exit(main(parser.parse_args()))
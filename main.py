@@ -1,13 +1,74 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+from os import getenv
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routes import checker_router, users_router
+from routes import checker_router, users_router, jobs_router
 from pydantic import BaseModel
+from logging_config import logger
+from utils.checker_factory import CHECKER_MODE, get_harmful_checker
+from database.connection import aping, async_engine
+from database.migrate import DB_CREATE_SCHEMA, acreate_schema
+from utils import metrics
 import uvicorn
 
+load_dotenv(override=True)
+
+# Configurations
+WARMUP_RETRY_INTERVAL = float(getenv("WARMUP_RETRY_INTERVAL", "10"))  # seconds between attempts to start the checker
+READY_DB_TIMEOUT = float(getenv("READY_DB_TIMEOUT", "2"))  # seconds /ready waits for the database
+
 class HealthResponse(BaseModel):
     status: str
 
-app = FastAPI()
+class ReadyResponse(BaseModel):
+    status: str
+    checker: bool
+    database: bool
+
+async def warm_up(app: FastAPI):
+    """
+    Build the checker and start its browsers (or connect to the scrapers),
+    retrying until it works. Runs after startup, so the server answers
+    ``/`` at once and ``/ready`` only once this is done.
+    """
+    while True:
+        try:
+            checker = await asyncio.to_thread(get_harmful_checker)
+            if CHECKER_MODE == "remote":
+                await checker.start()
+            else:
+                from utils.extraction import load_encoding
+                await asyncio.to_thread(load_encoding)
+                await asyncio.to_thread(checker.browser_pool.start)
+            app.state.checker_ready = True
+            logger.info("Checker warmed up")
+            return
+        except Exception as e:
+            logger.error(f"Failed to warm up checker, retrying in {WARMUP_RETRY_INTERVAL}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_CREATE_SCHEMA:
+        await acreate_schema()
+    app.state.checker_ready = False
+    warmup = asyncio.create_task(warm_up(app))
+    yield
+    warmup.cancel()
+    try:
+        await warmup
+    except asyncio.CancelledError:
+        pass
+    if app.state.checker_ready:
+        await asyncio.to_thread(get_harmful_checker().close)
+    if CHECKER_MODE != "remote":
+        from utils.browser_pool import browser_pool
+        await asyncio.to_thread(browser_pool.shutdown)
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"]
 
@@ -23,10 +84,27 @@ prefix = "/api/v1"
 
 app.include_router(checker_router, prefix=f"{prefix}", tags=["checker"])
 app.include_router(users_router, prefix=f"{prefix}", tags=["auth"])
+app.include_router(jobs_router, prefix=f"{prefix}", tags=["jobs"])
 
 @app.get("/", response_model=HealthResponse)
 async def health():
     return HealthResponse(status="Ok")
 
+@app.get("/ready", response_model=ReadyResponse)
+async def ready(response: Response):
+    """Readiness probe: 503 until the checker is warmed up and while the database is unreachable."""
+    checker = app.state.checker_ready
+    database = await aping(READY_DB_TIMEOUT)
+    if not (checker and database):
+        response.status_code = 503
+    return ReadyResponse(status="Ok" if checker and database else "Unavailable", checker=checker, database=database)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    data, content_type = metrics.render()
+    return Response(content=data, media_type=content_type)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=80, log_level="info")
\ No newline at end of file
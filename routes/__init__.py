@@ -1,2 +1,3 @@
 from .checkerRoute import router as checker_router
-from .usersRoute import router as users_router
\ No newline at end of file
+from .usersRoute import router as users_router
+from .jobsRoute import router as jobs_router
\ No newline at end of file
@@ -1,14 +1,59 @@
+from collections import OrderedDict
+import time
 from fastapi import HTTPException, status, Depends
 import jwt
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
 from os import getenv
+from typing import Optional
 load_dotenv()
 
+# Configurations
+AUTH_TOKEN_CACHE_SIZE = int(getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))  # 0 disables the cache
+
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
-def get_user_id(token: str = Depends(oauth2_scheme)) -> str:
+class TokenCache:
+    """
+    LRU of tokens that already passed validation, mapping token to (user_id, exp).
+
+    A token is only served from here until its ``exp``; after that it is
+    rejected as expired, exactly as a fresh decode would. Not thread-safe:
+    ``get_user_id`` is async, so it is only touched from the event loop.
+    """
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._tokens: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[tuple[str, float]]:
+        entry = self._tokens.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._tokens.move_to_end(token)
+        self.hits += 1
+        return entry
+
+    def set(self, token: str, user_id: str, exp: float) -> None:
+        if self.max_size <= 0:
+            return
+        self._tokens[token] = (user_id, exp)
+        self._tokens.move_to_end(token)
+        while len(self._tokens) > self.max_size:
+            self._tokens.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        self._tokens.pop(token, None)
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+token_cache = TokenCache()
+
+async def get_user_id(token: str = Depends(oauth2_scheme)) -> str:
     """
     Extracts the user ID from the JWT token.
     
@@ -16,6 +61,13 @@ def get_user_id(token: str = Depends(oauth2_scheme)) -> str:
     :return: User ID extracted from the token
     :raises HTTPException: If the token is invalid or expired
     """
+    cached = token_cache.get(token)
+    if cached is not None:
+        user_id, exp = cached
+        if time.time() < exp:
+            return user_id
+        token_cache.discard(token)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     try:
         payload = jwt.decode(token, getenv("SECRET_KEY_ENCRYPTION"), algorithms=["HS256"])
         if "user_id" not in payload:
@@ -24,8 +76,11 @@ def get_user_id(token: str = Depends(oauth2_scheme)) -> str:
                 detail="Could not validate credentials", 
                 headers={"WWW-Authenticate": "Bearer"}
                 )
+        # Tokens without an expiry are not cached, so they are re-checked every time
+        if "exp" in payload:
+            token_cache.set(token, payload["user_id"], float(payload["exp"]))
         return payload.get("user_id")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except jwt.InvalidTokenError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -1,23 +1,53 @@
+import json
+from os import getenv
+from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from database.connection import get_db
 from logging_config import logger
-from schemas.checkSchemas import CheckRequest
-from utils.checker import harmful_checker 
-from pydantic import BaseModel, Field
+from schemas.checkSchemas import NO_CONTENT_RESULT, BatchCheckRequest, CheckRequest, HarmfulCheckerConfig
+from utils.checker_factory import get_harmful_checker
+from utils.errors import CheckUnavailable, ClassificationFailed
 from routes.auth import get_user_id
 
+load_dotenv(override=True)
+
+# Configurations
+SSE_HEARTBEAT_INTERVAL = float(getenv("SSE_HEARTBEAT_INTERVAL", "10"))  # seconds; also how soon a gone client is noticed
+CHECKER_STARTING_RETRY_AFTER = int(getenv("CHECKER_STARTING_RETRY_AFTER", "5"))  # seconds clients wait while the checker warms up
+
 router = APIRouter()
 
-class HarmfulCheckerConfig(BaseModel):
-    is_harmful: bool = Field(description="Indicates if the content is harmful (like online gambling or phising) or not.")
-    summary_harmful: str = Field(description="Summary of the harmful content (hoax, phising, not safety, online gambling, pirating, virus) detected.")
+CLASSIFICATION_FAILED_DETAIL = "The page could not be classified."
+
+def check_unavailable_detail(error: CheckUnavailable) -> str:
+    if error.throttled:
+        return "Too many checks in progress, please retry later."
+    return "Harmful content check is temporarily unavailable, please retry later."
+
+def ready_checker(request: Request):
+    """
+    The checker, once the API has warmed it up. Until then 503, so that no
+    request builds it (or waits for it being built) on the event loop.
+    """
+    if not getattr(request.app.state, "checker_ready", False):
+        raise HTTPException(
+            status_code=503,
+            detail="The checker is starting, please retry later.",
+            headers={"Retry-After": str(CHECKER_STARTING_RETRY_AFTER)},
+        )
+    return get_harmful_checker()
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/check_harmful", status_code=200, response_model=HarmfulCheckerConfig)
-def check_harmful_content(
+async def check_harmful_content(
     request: CheckRequest,
     user_id: str = Depends(get_user_id),  # Assuming get_user_id is defined in auth.py
     db: Session = Depends(get_db),
+    checker=Depends(ready_checker),
 ):
     """
     Endpoint to check if the content is harmful.
@@ -28,11 +58,105 @@ def check_harmful_content(
     """
     try:
         logger.info(f"Checking harmful content: {request.url}")
-        harmful_result = harmful_checker.harmful_checker(request.url)
+        harmful_result = await checker.aharmful_checker(
+            request.url, bypass_cache=request.bypass_cache, user_id=user_id
+        )
         if harmful_result is None:
             logger.warning("No content found for harmful check.")
-            return {"is_harmful": False, "summary_harmful": "No content to check."}
+            return NO_CONTENT_RESULT
         return harmful_result
+    except CheckUnavailable as e:
+        logger.warning(f"Harmful check not completed: {str(e)}")
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+        raise HTTPException(status_code=503, detail=check_unavailable_detail(e), headers=headers)
+    except ClassificationFailed as e:
+        logger.error(f"Harmful check failed: {str(e)}")
+        raise HTTPException(status_code=502, detail=CLASSIFICATION_FAILED_DETAIL)
     except Exception as e:
         logger.error(f"Error checking harmful content: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.post("/check_harmful/batch", status_code=200)
+async def check_harmful_batch(
+    request: BatchCheckRequest,
+    user_id: str = Depends(get_user_id),
+    checker=Depends(ready_checker),
+):
+    """
+    Endpoint to check many URLs at once.
+
+    Results are streamed as NDJSON, one line per unique URL in completion order:
+    ``{"url": ..., "is_harmful": ..., "summary_harmful": ...}`` or
+    ``{"url": ..., "error": ..., "retryable": ...}`` if the check failed.
+
+    :param request: Request object containing the URLs to be checked
+    :return: Streaming NDJSON response
+    """
+    logger.info(f"Checking harmful content in batch of {len(request.urls)} URLs")
+
+    async def results():
+        async for url, harmful_result, error in checker.abatch_check(
+            request.urls, bypass_cache=request.bypass_cache, user_id=user_id
+        ):
+            if isinstance(error, CheckUnavailable):
+                line = {"url": url, "error": check_unavailable_detail(error), "retryable": True}
+            elif isinstance(error, ClassificationFailed):
+                line = {"url": url, "error": CLASSIFICATION_FAILED_DETAIL, "retryable": False}
+            elif error is not None:
+                line = {"url": url, "error": "Internal Server Error", "retryable": False}
+            elif harmful_result is None:
+                line = {"url": url, **NO_CONTENT_RESULT}
+            else:
+                line = {"url": url, **harmful_result.model_dump()}
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.post("/check_harmful/stream", status_code=200)
+async def check_harmful_stream(
+    request: CheckRequest,
+    user_id: str = Depends(get_user_id),
+    checker=Depends(ready_checker),
+):
+    """
+    Endpoint to check one URL with live progress, as Server-Sent Events.
+
+    Events, each with ``elapsed_ms``: ``provisional`` (the cached verdict while a
+    fresh check runs), ``navigated``, ``text_extracted``, ``screenshot_captured``,
+    ``classifying``, then ``result`` with the same body as ``/check_harmful``, or
+    ``error`` with ``{"error": ..., "retryable": ...}``. Comment lines are sent as
+    heartbeats. Closing the connection cancels the check and frees its browser.
+
+    :param request: Request object containing the URL to be checked
+    :return: Streaming text/event-stream response
+    """
+    logger.info(f"Streaming harmful check: {request.url}")
+
+    async def events():
+        try:
+            async for event in checker.astream_check(
+                request.url, bypass_cache=request.bypass_cache, user_id=user_id, heartbeat=SSE_HEARTBEAT_INTERVAL
+            ):
+                name = event.pop("event")
+                if name == "heartbeat":
+                    yield ": heartbeat\n\n"
+                elif name == "result":
+                    result = event.pop("result")
+                    yield sse_event("result", {**(result.model_dump() if result is not None else NO_CONTENT_RESULT), **event})
+                else:
+                    yield sse_event(name, event)
+        except CheckUnavailable as e:
+            logger.warning(f"Harmful check not completed: {str(e)}")
+            yield sse_event("error", {"error": check_unavailable_detail(e), "retryable": True})
+        except ClassificationFailed as e:
+            logger.error(f"Harmful check failed: {str(e)}")
+            yield sse_event("error", {"error": CLASSIFICATION_FAILED_DETAIL, "retryable": False})
+        except Exception as e:
+            logger.error(f"Error checking harmful content: {str(e)}")
+            yield sse_event("error", {"error": "Internal Server Error", "retryable": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
\ No newline at end of file
@@ -0,0 +1,54 @@
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import get_async_db
+from logging_config import logger
+from routes.auth import get_user_id
+from schemas.jobSchemas import JobResponse, JobSubmitRequest
+from utils.job_queue import PRIORITIES, get_job, submit_job
+
+router = APIRouter()
+
+@router.post("/jobs", status_code=202, response_model=JobResponse)
+async def submit_check_job(
+    request: JobSubmitRequest,
+    user_id: str = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Endpoint to queue a harmful content check and return immediately.
+
+    Poll ``GET /jobs/{job_id}`` for the result. Submitting a URL that already
+    has a queued or running job returns that job with ``joined`` set; if it is
+    already running, ``bypass_cache`` shows whether it skips the cache.
+
+    :param request: Request object containing the URL and the queue lane
+    :param db: SQLAlchemy async session object
+    :return: The queued job
+    """
+    try:
+        logger.info(f"Queueing harmful check job for: {request.url} ({request.priority})")
+        job, joined = await submit_job(db, request.url, user_id, PRIORITIES[request.priority], request.bypass_cache)
+        return JobResponse.model_validate(job).model_copy(update={"joined": joined})
+    except Exception as e:
+        logger.error(f"Error queueing harmful check job: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@router.get("/jobs/{job_id}", status_code=200, response_model=JobResponse)
+async def get_check_job(
+    job_id: UUID,
+    user_id: str = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Endpoint to poll the status and result of a queued check. Only users who
+    submitted the job can see it.
+
+    :param job_id: ID returned by ``POST /jobs``
+    :param db: SQLAlchemy async session object
+    :return: The job with its result once it is done
+    """
+    job = await get_job(db, job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
\ No newline at end of file
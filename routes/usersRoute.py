@@ -1,28 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
-from sqlalchemy.orm import Session
-from database.connection import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import get_async_db
 from fastapi.security import OAuth2PasswordRequestForm
 from logging_config import logger
 from routes.auth import get_user_id
 from database.models import UserAuth, User
-from utils.auth import create_access_token, verify_password, get_password_hash
+from utils.auth import create_access_token, averify_password
 
 router = APIRouter()
 
-def login_users(db: Session, username: str, password: str) -> str:
+async def login_users(db: AsyncSession, username: str, password: str) -> str:
     """
     Log in a user by verifying the username and password.
     
-    :param db: SQLAlchemy session object
+    :param db: SQLAlchemy async session object
     :param username: Username of the user
     :param password: Password of the user
     :return: UserAuth object if login is successful
     """
     try:
         logger.info(f"User login attempt with username: {username}")
-        user_auth = db.query(UserAuth).filter(UserAuth.username == username).first()
+        user_auth = (await db.execute(select(UserAuth).where(UserAuth.username == username))).scalars().first()
         user_hashed_password = user_auth.password if user_auth else None
-        if not user_auth or not verify_password(password, user_hashed_password):
+        if not user_auth or not await averify_password(password, user_hashed_password):
             raise ValueError("Invalid username or password")
         access_token = create_access_token(data={"user_id": str(user_auth.user_id), "username": user_auth.username})
         return access_token
@@ -32,21 +33,21 @@ def login_users(db: Session, username: str, password: str) -> str:
     
 
 @router.post("/login", status_code=200)
-def login_endpoint(
+async def login_endpoint(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     response: Response = None
 ):
     """
     Endpoint to log in a user.
 
     :param form_data: Form data containing username and password
-    :param db: SQLAlchemy session object
+    :param db: SQLAlchemy async session object
     :return: Response with access token
     """
     try:
         logger.info(f"User login attempt with username: {form_data.username}")
-        access_token = login_users(db, form_data.username, form_data.password)
+        access_token = await login_users(db, form_data.username, form_data.password)
         if response is None:
             raise HTTPException(status_code=500, detail="Response object is required")
         response.set_cookie(
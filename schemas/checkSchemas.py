@@ -1,10 +1,29 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 class CheckRequest(BaseModel):
     url: str
+    bypass_cache: bool = Field(default=False, description="Skip cached verdicts and always run a fresh check.")
 
     @field_validator('url')
     def validate_url(cls, v: str) -> str:
         if not v.startswith(('http://', 'https://')):
             raise ValueError('URL must start with http:// or https://')
-        return v
\ No newline at end of file
+        return v
+
+class BatchCheckRequest(BaseModel):
+    urls: list[str] = Field(min_length=1, max_length=500)
+    bypass_cache: bool = Field(default=False, description="Skip cached verdicts and always run fresh checks.")
+
+    @field_validator('urls')
+    def validate_urls(cls, v: list[str]) -> list[str]:
+        for url in v:
+            if not url.startswith(('http://', 'https://')):
+                raise ValueError(f'URL must start with http:// or https://: {url}')
+        return v
+
+class HarmfulCheckerConfig(BaseModel):
+    is_harmful: bool = Field(description="Indicates if the content is harmful (like online gambling or phising) or not.")
+    summary_harmful: str = Field(description="Summary of the harmful content (hoax, phising, not safety, online gambling, pirating, virus) detected.")
+
+# Reported when a page could not be read; nothing on it was judged
+NO_CONTENT_RESULT = {"is_harmful": False, "summary_harmful": "No content to check."}
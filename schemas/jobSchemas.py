@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Literal, Optional
+from uuid import UUID
+from pydantic import BaseModel, ConfigDict, Field
+from schemas.checkSchemas import CheckRequest, HarmfulCheckerConfig
+
+class JobSubmitRequest(CheckRequest):
+    priority: Literal["interactive", "bulk"] = Field(default="interactive", description="Queue lane; interactive jobs are picked up before bulk ones.")
+
+class JobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    url: str
+    status: str = Field(description="queued, running, done or failed.")
+    bypass_cache: bool = Field(default=False, description="Whether the job skips cached verdicts.")
+    joined: bool = Field(default=False, description="Set on submit when an active job for the same URL was returned.")
+    attempts: int
+    result: Optional[HarmfulCheckerConfig] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
\ No newline at end of file
@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
@@ -10,8 +12,13 @@ load_dotenv()
 SECRET_KEY = getenv("SECRET_KEY_ENCRYPTION")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+AUTH_HASH_WORKERS = int(getenv("AUTH_HASH_WORKERS", "2"))  # threads doing bcrypt; logins beyond this queue up
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is slow on purpose. Running it here keeps a login burst from taking
+# over the threadpool that sync endpoints and dependencies share.
+_hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain password against a hashed password.
@@ -31,6 +38,10 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """Same as ``verify_password``, run on the bcrypt executor."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running forever on its own daemon thread.
+
+    Playwright objects are bound to the loop (or thread) that created them, so
+    everything that touches the browsers is scheduled onto this loop, whether
+    the caller is a sync threadpool worker or another event loop.
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def start(self) -> None:
+        """Start the loop thread if it is not running yet. Safe to call repeatedly."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedule a coroutine on the loop.
+
+        :param coro: Coroutine to run
+        :return: concurrent.futures.Future resolved with the coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the loop and block the calling thread until it finishes.
+
+        :param coro: Coroutine to run
+        :param timeout: Seconds to wait for the result, None to wait forever
+        :return: Result of the coroutine
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError(f"{self.name}: blocking run() called from inside the loop thread")
+        return self.submit(coro).result(timeout)
+
+    async def arun(self, coro: Coroutine) -> Any:
+        """
+        Await a coroutine on the loop from any other event loop without blocking it.
+
+        :param coro: Coroutine to run
+        :return: Result of the coroutine
+        """
+        if self.in_loop_thread():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
@@ -0,0 +1,229 @@
+import asyncio
+import platform
+import subprocess
+from contextlib import nullcontext
+from os import getenv
+from typing import Any, Awaitable, Callable, Optional
+from dotenv import load_dotenv
+from playwright.async_api import async_playwright, Browser, BrowserContext, Error as PlaywrightError
+from logging_config import logger
+from utils.background_loop import BackgroundLoop
+from utils.errors import CheckUnavailable
+from utils.timing import StageTimer
+
+load_dotenv(override=True)
+
+# Configurations
+BROWSER_POOL_SIZE = int(getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_PAGES = int(getenv("BROWSER_MAX_PAGES", "50"))  # recycle a browser after this many checks
+BROWSER_MAX_WAITERS = int(getenv("BROWSER_MAX_WAITERS", "32"))  # checks allowed to queue for a browser
+BROWSER_ACQUIRE_TIMEOUT = float(getenv("BROWSER_ACQUIRE_TIMEOUT", "30"))  # seconds
+
+checker_loop = BackgroundLoop(name="checker-loop")
+
+
+class BrowserPoolBusy(CheckUnavailable):
+    """Raised when every browser is busy and the wait queue is full or the wait timed out."""
+
+    throttled = True
+
+
+def install_playwright_browsers():
+    """Run 'playwright install' based on the operating system."""
+    try:
+        os_name = platform.system()
+        command = ["playwright", "install"]
+        logger.info(f"Installing Playwright browsers with command: {' '.join(command)}")
+        subprocess.run(command, check=True, shell=(os_name == "Windows"))
+        logger.info("Playwright browsers installed successfully.")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to install Playwright browsers: {e}")
+        raise
+
+
+class _BrowserSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.browser: Optional[Browser] = None
+        self.pages_served = 0
+
+    def is_healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    A fixed number of long-lived Chromium browsers shared by all checks.
+
+    Every check gets its own incognito context, so cookies and storage never
+    leak between URLs. Browsers are relaunched after ``max_pages`` checks or
+    as soon as they are found disconnected. All Playwright work runs on
+    ``checker_loop``; use ``run`` from sync code and ``arun`` from async code.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_pages: int = BROWSER_MAX_PAGES,
+        max_waiters: int = BROWSER_MAX_WAITERS,
+        acquire_timeout: float = BROWSER_ACQUIRE_TIMEOUT,
+        loop: BackgroundLoop = checker_loop,
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_waiters = max_waiters
+        self.acquire_timeout = acquire_timeout
+        self.loop = loop
+        self._playwright = None
+        self._slots: list[_BrowserSlot] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._waiters = 0
+        self._startup_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Launch the browsers now instead of on the first check."""
+        self.loop.run(self._ensure_started())
+
+    def shutdown(self) -> None:
+        """Close every browser and stop Playwright."""
+        if self._startup_task is None:
+            return
+        self.loop.run(self._shutdown())
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "waiters": self._waiters,
+            "pages_served": [slot.pages_served for slot in self._slots],
+        }
+
+    def run(self, fn: Callable[[BrowserContext], Awaitable[Any]]) -> Any:
+        """
+        Run ``fn`` with a fresh incognito context, blocking until it finishes.
+
+        :param fn: Coroutine function receiving the BrowserContext
+        :return: Whatever ``fn`` returns
+        :raises BrowserPoolBusy: If no browser became available in time
+        """
+        return self.loop.run(self.with_context(fn))
+
+    async def with_context(self, fn: Callable[[BrowserContext], Awaitable[Any]], timer: Optional[StageTimer] = None) -> Any:
+        """Same as ``run`` but must be awaited from inside ``checker_loop``."""
+        with timer.stage("acquire") if timer else nullcontext():
+            await self._ensure_started()
+            slot = await self._acquire()
+        context = None
+        try:
+            context = await slot.browser.new_context()
+            return await fn(context)
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except PlaywrightError:
+                    pass
+            await self._release(slot)
+
+    async def _ensure_started(self) -> None:
+        if self._startup_task is None:
+            self._startup_task = asyncio.ensure_future(self._startup())
+        try:
+            await asyncio.shield(self._startup_task)
+        except Exception:
+            # Let the next check retry a failed startup instead of failing forever
+            self._startup_task = None
+            raise
+
+    async def _startup(self) -> None:
+        logger.info(f"[BrowserPool] Starting {self.size} browser(s)")
+        self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        self._slots = [_BrowserSlot(i) for i in range(self.size)]
+        try:
+            for slot in self._slots:
+                await self._launch(slot)
+                self._idle.put_nowait(slot)
+        except Exception as e:
+            logger.error(f"[BrowserPool] Failed to start browsers: {e}")
+            await self._close_all()
+            raise
+        logger.info(f"[BrowserPool] {self.size} browser(s) ready")
+
+    async def _launch(self, slot: _BrowserSlot) -> None:
+        try:
+            slot.browser = await self._playwright.chromium.launch(headless=True)
+        except PlaywrightError as e:
+            if "Executable doesn't exist" not in str(e):
+                raise
+            logger.warning("Browser executable missing. Attempting to install Playwright browsers...")
+            await asyncio.to_thread(install_playwright_browsers)
+            slot.browser = await self._playwright.chromium.launch(headless=True)
+        slot.pages_served = 0
+
+    async def _recycle(self, slot: _BrowserSlot, reason: str) -> None:
+        logger.info(f"[BrowserPool] Recycling browser {slot.index} ({reason})")
+        old_browser, slot.browser = slot.browser, None
+        if old_browser is not None:
+            try:
+                await old_browser.close()
+            except PlaywrightError:
+                pass
+        await self._launch(slot)
+
+    async def _acquire(self) -> _BrowserSlot:
+        if self._idle.empty() and self._waiters >= self.max_waiters:
+            raise BrowserPoolBusy(
+                f"All {self.size} browsers busy and {self._waiters} checks already waiting", retry_after=self.acquire_timeout
+            )
+        self._waiters += 1
+        try:
+            slot = await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise BrowserPoolBusy(f"No browser available after {self.acquire_timeout}s", retry_after=self.acquire_timeout)
+        finally:
+            self._waiters -= 1
+        if not slot.is_healthy():
+            try:
+                await self._recycle(slot, "unhealthy")
+            except Exception:
+                self._idle.put_nowait(slot)
+                raise
+        return slot
+
+    async def _release(self, slot: _BrowserSlot) -> None:
+        slot.pages_served += 1
+        try:
+            if not slot.is_healthy():
+                await self._recycle(slot, "crashed")
+            elif slot.pages_served >= self.max_pages:
+                await self._recycle(slot, f"served {slot.pages_served} pages")
+        except Exception as e:
+            # The slot goes back anyway; the next acquire retries the launch
+            logger.error(f"[BrowserPool] Failed to relaunch browser {slot.index}: {e}")
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def _shutdown(self) -> None:
+        try:
+            await self._startup_task
+        except Exception:
+            pass
+        await self._close_all()
+        self._startup_task = None
+        logger.info("[BrowserPool] Shut down")
+
+    async def _close_all(self) -> None:
+        for slot in self._slots:
+            if slot.browser is not None:
+                try:
+                    await slot.browser.close()
+                except PlaywrightError:
+                    pass
+                slot.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+browser_pool = BrowserPool()
@@ -1,170 +1,492 @@
-from typing import Optional
-import logging
+from typing import AsyncIterator, Callable, NamedTuple, Optional
+from collections import Counter
+from contextlib import nullcontext
 import os
-from langchain_openai import AzureChatOpenAI
-from langchain.prompts import HumanMessagePromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-import tempfile
 import asyncio
-from playwright.sync_api import sync_playwright
-import platform
-import subprocess
-import sys
+import time
+from dotenv import load_dotenv
+from logging_config import logger
+from schemas.checkSchemas import HarmfulCheckerConfig
+from playwright.async_api import BrowserContext
+from utils.browser_pool import BrowserPool, BrowserPoolBusy, browser_pool
+from utils.imaging import VIEWPORT, prepare_screenshots
+from utils.navigation import install_request_blocking, load_page
+from utils.extraction import EXTRACT_PAGE_JS, PAGE_TEXT_MAX_CHARS, build_prompt_text, count_tokens
+from utils.fingerprint import FINGERPRINT_ENABLED, FINGERPRINT_WARM_ROWS, Fingerprint, FingerprintIndex, fingerprint
+from utils.errors import CheckUnavailable, ClassificationFailed
+from utils.llm_gateway import LLMGateway
+from utils.prefilter import PREFILTER_ENABLED, Prefilter
+from utils.scan_history import SCAN_HISTORY_ENABLED, ScanHistory
+from utils.single_flight import SingleFlight
+from utils.timing import StageTimer
+from utils import metrics
+from utils.urls import normalize_url, site_key
+from utils.verdict_cache import VerdictCache
 
 load_dotenv(override=True)
 
-def setup_logging(log_file='app.log'):
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        encoding='utf-8'
-    )
-    return logging.getLogger("AppLogger")
+# Configurations
+BATCH_SCRAPE_CONCURRENCY = int(os.getenv("BATCH_SCRAPE_CONCURRENCY", "4"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "300"))  # reserved per call until usage is known
 
-logger = setup_logging()
+SYSTEM_PROMPT = """You are a helpful assistant that detects harmful content in URLs.
+                         You will be provided with HTML content and images from the URL. 
+                         Your task is to determine if the content is harmful (like online gambling or phishing) or not, 
+                         and provide a summary of the harmful content detected."""
 
-class HarmfulCheckerConfig(BaseModel):
-    is_harmful: bool = Field(description="Indicates if the content is harmful (like online gambling or phising) or not.")
-    summary_harmful: str = Field(description="Summary of the harmful content (hoax, phising, not safety, online gambling, pirating, virus) detected.")
+# Stage boundaries reported to streaming callers: (stage, phase) -> event
+STAGE_EVENTS = {
+    ("navigate", "finished"): "navigated",
+    ("parse", "finished"): "text_extracted",
+    ("screenshot", "finished"): "screenshot_captured",
+    ("llm", "started"): "classifying",
+}
+
+class ScrapeResult(NamedTuple):
+    body_content: Optional[str]
+    images: Optional[dict]
+    timings: dict
+    image_tokens: int = 0
+    perceptual_hash: Optional[int] = None
+    page_text: Optional[str] = None  # visible body text alone, without the URL, forms and links of ``body_content``
+    final_url: Optional[str] = None  # where the page ended up after redirects
+
+class StageLimits:
+    """Caps how many scrapes and LLM calls of one batch run at the same time."""
+    def __init__(self, scrape: int = BATCH_SCRAPE_CONCURRENCY, classify: int = BATCH_LLM_CONCURRENCY):
+        self.scrape = asyncio.Semaphore(scrape)
+        self.classify = asyncio.Semaphore(classify)
 
 class HarmfulChecker:
-    def __init__(self):
-        self.llm = AzureChatOpenAI(
-            deployment_name="gpt-4.1",
-            model="gpt-4.1",
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-            temperature=0.5,
-            max_tokens=5000
-        )
+    def __init__(
+        self,
+        browser_pool: BrowserPool = browser_pool,
+        verdict_cache: Optional[VerdictCache] = None,
+        prefilter: Optional[Prefilter] = None,
+        llm=None,
+        llm_gateway: Optional[LLMGateway] = None,
+        scan_history: Optional[ScanHistory] = None,
+        fingerprints: Optional[FingerprintIndex] = None,
+    ):
+        self.browser_pool = browser_pool
+        self.verdict_cache = verdict_cache or VerdictCache()
+        self.prefilter = prefilter or (Prefilter.from_env() if PREFILTER_ENABLED else None)
+        self.single_flight = SingleFlight()
+        self.llm_gateway = llm_gateway or LLMGateway()
+        self.scan_history = scan_history or (ScanHistory() if SCAN_HISTORY_ENABLED else None)
+        self.fingerprints = fingerprints or (FingerprintIndex() if FINGERPRINT_ENABLED else None)
+        self._fingerprint_warmup: Optional[asyncio.Task] = None
+        # How many checks each tier decided: cache, allowlist, denylist, reputation, fingerprint, llm
+        self.decisions = Counter()
+        self._llm = llm
 
-    def install_playwright_browsers(self):
-        """Run 'playwright install' based on the operating system."""
-        try:
-            os_name = platform.system()
-            command = ["playwright", "install"]
-            logger.info(f"Installing Playwright browsers with command: {' '.join(command)}")
-            subprocess.run(command, check=True, shell=(os_name == "Windows"))
-            logger.info("Playwright browsers installed successfully.")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to install Playwright browsers: {e}")
-            sys.exit(1)
-
-    def get_html_and_images(self, url: str) -> Optional[tuple]:
+    @property
+    def llm(self):
+        """The chat model, built on first use: langchain_openai takes over a second to import."""
+        if self._llm is None:
+            from langchain_openai import AzureChatOpenAI
+
+            self._llm = AzureChatOpenAI(
+                deployment_name="gpt-4.1",
+                model="gpt-4.1",
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                temperature=0.5,
+                max_tokens=5000,
+                max_retries=0,  # retries are done by the gateway, which knows about every other call
+            )
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm) -> None:
+        self._llm = llm
+
+    def stats(self) -> dict:
+        return {
+            "decisions": dict(self.decisions),
+            "verdict_cache": self.verdict_cache.stats(),
+            "single_flight": self.single_flight.stats(),
+            "llm_gateway": self.llm_gateway.stats(),
+            "scan_history": self.scan_history.stats() if self.scan_history else None,
+            "fingerprints": self.fingerprints.stats() if self.fingerprints else None,
+        }
+
+    def close(self) -> None:
+        """Write out buffered scan history; call before the process exits."""
+        if self.scan_history is not None:
+            self.browser_pool.loop.run(self.scan_history.flush())
+
+    def get_html_and_images(self, url: str) -> Optional[ScrapeResult]:
+        return self.browser_pool.loop.run(self._get_html_and_images(url))
+
+    async def aget_html_and_images(self, url: str) -> Optional[ScrapeResult]:
+        return await self.browser_pool.loop.arun(self._get_html_and_images(url))
+
+    async def _get_html_and_images(self, url: str, timer: Optional[StageTimer] = None) -> Optional[ScrapeResult]:
+        timer = timer or StageTimer()
         try:
             logger.info(f"[WebScraper] Attempting to go URL with Playwright: {url}")
-            with sync_playwright() as p:
-                browser = None
-                try:
-                    browser = p.chromium.launch(headless=True)
-                except Exception as e:
-                    if "Executable doesn't exist" in str(e):
-                        logger.warning("Browser executable missing. Attempting to install Playwright browsers...")
-                        self.install_playwright_browsers()
-                        try:
-                            browser = p.chromium.launch(headless=True)
-                        except Exception as retry_e:
-                            logger.error(f"Failed to launch browser after installation: {retry_e}")
-                            return None
-                    else:
-                        logger.error(f"Unexpected error launching browser: {e}")
-                        return None
-                page = browser.new_page()
-                page.goto(url, timeout=30000)
-                page.wait_for_load_state("networkidle", timeout=10000)
-                # Get HTML
-                content = page.content()
-                soup = BeautifulSoup(content, 'html.parser')
-                body = soup.body
-                if not body:
-                    logger.warning(f"[WebScraper] No <body> tag found in: {url}")
-                    body_content = None
-                else:
-                    body_content = str(body)
-                    if not body_content.strip():
-                        logger.warning(f"[WebScraper] No content extracted from <body> of: {url}")
-                        body_content = None
-                    else:
-                        body_content = f"url: {url}\n{body_content}"
-                        logger.info(f"[WebScraper] Successfully extracted HTML from <body> of: {url} (length: {len(body_content)} characters)")
-                # Get images
-                try:
-                    top_screenshot = page.screenshot(type="png")
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight/2);")
-                    middle_screenshot = page.screenshot(type="png")
-                    import base64
-                    images = {
-                        "first": f"data:image/png;base64,{base64.b64encode(top_screenshot).decode()}",
-                        "second": f"data:image/png;base64,{base64.b64encode(middle_screenshot).decode()}"
-                    }
-                    logger.info(f"[WebScraper] Successfully captured screenshots for {url}")
-                except Exception as img_e:
-                    logger.error(f"[WebScraper] Failed to capture screenshots from {url}: {img_e}")
-                    images = None
-                if body_content is None and images is None:
-                    return None
-                return (body_content, images)
+            return await self.browser_pool.with_context(lambda context: self._scrape(context, url, timer), timer)
+        except BrowserPoolBusy:
+            # Saturation is not "no content": the caller must report it and retry later
+            raise
         except Exception as e:
             logger.error(f"[WebScraper] Failed to scrape {url} with Playwright: {e}")
             return None
-        
-    def harmful_checker(self, url) -> Optional[HarmfulCheckerConfig]:
+
+    async def _scrape(self, context: BrowserContext, url: str, timer: StageTimer) -> Optional[ScrapeResult]:
+        await install_request_blocking(context)
+        page = await context.new_page()
+        await page.set_viewport_size(VIEWPORT)
+        quiet = await load_page(page, url, timer)
+        if not quiet:
+            logger.info(f"[WebScraper] {url} kept loading; reading it as it is")
+        if self.prefilter is not None and self.prefilter.check_final_url(page.url) is not None:
+            # The lists decide where the redirects ended; nothing more to read
+            return ScrapeResult(None, None, timer.timings, final_url=page.url)
+        # Get text
+        with timer.stage("extract"):
+            page_data = await page.evaluate(EXTRACT_PAGE_JS, PAGE_TEXT_MAX_CHARS)
+        with timer.stage("parse"):
+            body_content = build_prompt_text(url, page_data)
+        if body_content is None:
+            logger.warning(f"[WebScraper] No content extracted from: {url}")
+        else:
+            logger.info(f"[WebScraper] Successfully extracted text from: {url} (length: {len(body_content)} characters)")
+        # Get images
+        try:
+            with timer.stage("screenshot"):
+                frames = [await page.screenshot(type="png")]
+                scrollable = await page.evaluate("document.documentElement.scrollHeight > window.innerHeight * 1.2")
+                if scrollable:
+                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight/2);")
+                    frames.append(await page.screenshot(type="png"))
+            with timer.stage("images"):
+                images, image_stats = await asyncio.to_thread(prepare_screenshots, frames)
+            logger.info(
+                f"[WebScraper] Successfully captured screenshots for {url} "
+                f"({image_stats['frames']} image(s), {image_stats['raw_bytes']} -> {image_stats['bytes']} bytes, "
+                f"~{image_stats['tokens']} vision tokens)"
+            )
+        except Exception as img_e:
+            logger.error(f"[WebScraper] Failed to capture screenshots from {url}: {img_e}")
+            images, image_stats = None, {"tokens": 0, "perceptual_hash": None}
+        if body_content is None and images is None:
+            return None
+        return ScrapeResult(
+            body_content, images, timer.timings, image_stats["tokens"], image_stats["perceptual_hash"],
+            (page_data or {}).get("text"), page.url,
+        )
+
+    def harmful_checker(self, url, bypass_cache: bool = False, user_id: Optional[str] = None) -> Optional[HarmfulCheckerConfig]:
+        """Blocking wrapper around ``aharmful_checker`` for sync callers."""
+        return self.browser_pool.loop.run(self._check(url, bypass_cache, user_id=user_id))
+
+    async def aharmful_checker(self, url, bypass_cache: bool = False, user_id: Optional[str] = None) -> Optional[HarmfulCheckerConfig]:
+        """
+        Check a URL without blocking the caller's event loop.
+
+        The scrape and the LLM call run on the browser pool's loop, so this can be
+        awaited from any event loop (e.g. a FastAPI endpoint).
+
+        :param url: URL to check
+        :param bypass_cache: Ignore cached verdicts; the fresh verdict is still cached
+        :param user_id: User the check is for, so LLM calls are shared fairly between users
+        :return: HarmfulCheckerConfig, or None if the page could not be checked
+        :raises CheckUnavailable: If the LLM or the browser pool is out of capacity, or the LLM is down; no verdict is implied
+        :raises ClassificationFailed: If the LLM rejected the page or gave an unparsable answer
+        """
+        return await self.browser_pool.loop.arun(self._check(url, bypass_cache, user_id=user_id))
+
+    async def abatch_check(
+        self, urls: list[str], bypass_cache: bool = False, limits: Optional[StageLimits] = None,
+        user_id: Optional[str] = None,
+    ) -> AsyncIterator[tuple[str, Optional[HarmfulCheckerConfig], Optional[Exception]]]:
+        """
+        Check many URLs, yielding each result as soon as it is ready.
+
+        URLs that normalize to the same key are checked once. Scrapes and LLM
+        calls are bounded separately by ``limits``, so a slow page never holds
+        back classification of pages that are already scraped.
+
+        :param urls: URLs to check
+        :param bypass_cache: Ignore cached verdicts
+        :param limits: Concurrency caps for this batch
+        :param user_id: User the batch is for
+        :return: Async iterator of (url, verdict or None, exception or None)
+        """
+        unique = {}
+        for url in urls:
+            unique.setdefault(normalize_url(url), url)
+        limits = limits or StageLimits()
+
+        async def run(url):
+            try:
+                return url, await self.browser_pool.loop.arun(self._check(url, bypass_cache, limits, user_id)), None
+            except Exception as e:
+                logger.error(f"[HarmfulChecker] Batch check failed for {url}: {e}")
+                return url, None, e
+
+        tasks = [asyncio.ensure_future(run(url)) for url in unique.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def astream_check(
+        self, url, bypass_cache: bool = False, user_id: Optional[str] = None, heartbeat: Optional[float] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Check a URL, yielding progress events as the check passes each stage.
+
+        Events are dicts with an ``event`` key:
+        ``provisional`` with the cached verdict, when ``bypass_cache`` asked for a fresh check;
+        ``navigated``, ``text_extracted``, ``screenshot_captured`` and ``classifying``;
+        ``heartbeat`` after ``heartbeat`` seconds without any other event;
+        and last ``result`` with ``result`` set to the verdict, or None if the page could not be checked.
+        Every event but heartbeats carries ``elapsed_ms``. A check that joins one already
+        running for the same URL only gets the result. Closing the iterator early cancels
+        the check, freeing its browser, unless another caller is waiting for the same URL.
+
+        :param url: URL to check
+        :param bypass_cache: Ignore cached verdicts; the fresh verdict is still cached
+        :param user_id: User the check is for
+        :param heartbeat: Seconds of silence before a heartbeat, None for no heartbeats
+        :return: Async iterator of events
+        :raises CheckUnavailable: If the LLM or the browser pool is out of capacity, or the LLM is down; no verdict is implied
+        :raises ClassificationFailed: If the LLM rejected the page or gave an unparsable answer
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+
+        def emit(event: Optional[dict]) -> None:
+            # Called on checker_loop; None marks the end of the check
+            if event is not None:
+                event["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+            except RuntimeError:
+                pass  # the caller's loop is closed
+
+        check = self.browser_pool.loop.submit(self._check(url, bypass_cache, user_id=user_id, on_event=emit))
+        check.add_done_callback(lambda _: emit(None))
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield {"event": "heartbeat"}
+                    continue
+                if event is None:
+                    break
+                yield event
+            yield {"event": "result", "result": check.result(), "elapsed_ms": round((time.perf_counter() - started) * 1000)}
+        finally:
+            check.cancel()
+
+    async def _check(
+        self, url, bypass_cache: bool = False, limits: Optional[StageLimits] = None, user_id: Optional[str] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+    ) -> Optional[HarmfulCheckerConfig]:
+        with StageTimer().stage("check"):
+            return await self._check_stages(url, bypass_cache, limits, user_id, on_event)
+
+    async def _check_stages(
+        self, url, bypass_cache: bool = False, limits: Optional[StageLimits] = None, user_id: Optional[str] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+    ) -> Optional[HarmfulCheckerConfig]:
+        if self.prefilter is not None:
+            decision = self.prefilter.check_url(url)
+            if decision is not None:
+                return self._decided(url, decision.tier, decision.verdict)
+        url_key = normalize_url(url)
+        if not bypass_cache:
+            cached = await self.verdict_cache.get(url_key)
+            if cached is not None:
+                return self._decided(url, "cache", cached)
+        elif on_event is not None:
+            # Something to show while the fresh check runs
+            cached = await self.verdict_cache.get(url_key)
+            if cached is not None:
+                on_event({"event": "provisional", "source": "cache", **cached.model_dump()})
+        if self.scan_history is not None and not bypass_cache:
+            verdict = await self.scan_history.reputation_verdict(site_key(url_key))
+            if verdict is not None:
+                return self._decided(url, "reputation", verdict)
+        # Concurrent checks of the same URL share one scrape and LLM call
+        return await self.single_flight.do(url_key, lambda: self._fresh_check(url, url_key, limits, user_id, on_event))
+
+    def _decided(self, url, tier: str, verdict: HarmfulCheckerConfig) -> HarmfulCheckerConfig:
+        self.decisions[tier] += 1
+        logger.info(f"[HarmfulChecker] {url} decided by {tier} (harmful: {verdict.is_harmful})")
+        return verdict
+
+    def _record(
+        self, url, tier: str, verdict: HarmfulCheckerConfig, user_id: Optional[str], page: Fingerprint, timer: StageTimer
+    ) -> None:
+        if self.scan_history is None:
+            return
+        self.scan_history.record(
+            url,
+            normalize_url(url),
+            page.domain,
+            verdict,
+            tier,
+            user_id=user_id,
+            model=getattr(self.llm, "deployment_name", None) if tier == "llm" else None,
+            content_hash=page.text_hash,
+            perceptual_hash=page.perceptual_hash,
+            timings=dict(timer.timings),
+        )
+
+    def _warm_fingerprints(self) -> None:
+        """Load fingerprints of recent scans in the background, once."""
+        if self._fingerprint_warmup is None and self.scan_history is not None:
+            self._fingerprint_warmup = asyncio.ensure_future(self._load_fingerprints())
+
+    async def _load_fingerprints(self) -> None:
+        try:
+            pages = await asyncio.to_thread(self.scan_history.recent_fingerprints, FINGERPRINT_WARM_ROWS)
+        except Exception as e:
+            logger.error(f"[HarmfulChecker] Failed to load recent fingerprints: {e}")
+            return
+        self.fingerprints.load(pages)
+        logger.info(f"[HarmfulChecker] Loaded {len(pages)} fingerprint(s) of recent scans")
+
+    async def _fresh_check(
+        self, url, url_key: str, limits: Optional[StageLimits] = None, user_id: Optional[str] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+    ) -> Optional[HarmfulCheckerConfig]:
+        result = await self._scrape_and_classify(url, limits, user_id, on_event)
+        if result is not None:
+            await self.verdict_cache.set(url_key, result)
+        return result
+
+    async def _scrape_and_classify(
+        self, url, limits: Optional[StageLimits] = None, user_id: Optional[str] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+    ) -> Optional[HarmfulCheckerConfig]:
+        def on_stage(name: str, phase: str) -> None:
+            event = STAGE_EVENTS.get((name, phase))
+            if event is not None:
+                on_event({"event": event})
+
+        timer = StageTimer(on_stage if on_event is not None else None)
         try:
             logger.info(f"[HarmfulChecker] Checking URL: {url}")
-            content = self.get_html_and_images(url)
+            async with limits.scrape if limits else nullcontext():
+                content = await self._get_html_and_images(url, timer)
+            if content and content.final_url and self.prefilter is not None:
+                decision = self.prefilter.check_final_url(content.final_url)
+                if decision is not None:
+                    return self._decided(url, decision.tier, decision.verdict)
             if not content:
                 logger.warning(f"[HarmfulChecker] No content found for {url}. Skipping harmful check.")
                 return None
             
-            body_content, images = content
+            body_content, images = content.body_content, content.images
             if not body_content and not images:
                 logger.warning(f"[HarmfulChecker] No HTML content found and no image for {url}. Skipping harmful check.")
                 return None
             
-            if body_content:
-                soup = BeautifulSoup(body_content, "html.parser")
-                text_content = soup.get_text(separator=" ", strip=True)
-                text_content = text_content.replace("{", "").replace("}", "")
-                body_content = text_content
-            else:
+            if not body_content:
                 body_content = "No HTML content available."
+
+            page = fingerprint(content.page_text, content.perceptual_hash, site_key(normalize_url(url)))
+            match = None
+            if self.fingerprints is not None:
+                self._warm_fingerprints()
+                with timer.stage("fingerprint"):
+                    match = self.fingerprints.match(page)
+                if match is not None and match.same_site:
+                    likeness = "has the same content as" if match.kind == "text" else "looks the same as"
+                    verdict = HarmfulCheckerConfig(
+                        is_harmful=match.verdict.is_harmful,
+                        summary_harmful=f"{match.verdict.summary_harmful} (This page {likeness} one checked earlier.)",
+                    )
+                    self._record(url, "fingerprint", verdict, user_id, page, timer)
+                    return self._decided(url, "fingerprint", verdict)
+
+            # Lookalike domains, keyword hits and copies of harmful pages elsewhere are hints for the LLM, not verdicts
+            signals = self.prefilter.signals(url, body_content) if self.prefilter is not None else []
+            if match is not None:
+                signals.append(
+                    "The text is identical to a page on another site that was judged harmful; "
+                    "check whether this page is the copy or the original."
+                )
+            if signals:
+                logger.info(f"[HarmfulChecker] Pre-screening signals for {url}: {signals}")
             
-            system_prompt = SystemMessagePromptTemplate.from_template(
-                template="""You are a helpful assistant that detects harmful content in URLs.
-                         You will be provided with HTML content and images from the URL. 
-                         Your task is to determine if the content is harmful (like online gambling or phishing) or not, 
-                         and provide a summary of the harmful content detected."""
-            )
+            from langchain_core.prompts import HumanMessagePromptTemplate, ChatPromptTemplate, SystemMessagePromptTemplate
+
+            system_prompt = SystemMessagePromptTemplate.from_template(template=SYSTEM_PROMPT)
+            signal_parts = [{
+                "type": "text",
+                "text": "Automated pre-screening flagged the following. These are hints and often wrong; "
+                        "judge the content itself.\n" + "\n".join(f"- {note}" for note in signals),
+            }] if signals else []
             prompt_template = HumanMessagePromptTemplate.from_template(
                 template=[
-                    {
-                        "type": "image_url",
-                        "image_url": images.get("first", ""),
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": images.get("second", ""),
-                    },
+                    *(
+                        {
+                            "type": "image_url",
+                            "image_url": image_url,
+                        }
+                        for image_url in (images or {}).values()
+                    ),
                     {
                         "type": "text",
                         "text": body_content if body_content else "No HTML content available."
-                    }
+                    },
+                    *signal_parts,
                 ]
             )
             prompt = ChatPromptTemplate.from_messages([system_prompt, prompt_template])
-            chain = prompt | self.llm.with_structured_output(HarmfulCheckerConfig)
+            chain = prompt | self.llm.with_structured_output(HarmfulCheckerConfig, include_raw=True)
             logger.info(f"[HarmfulChecker] Running harmful content check for {url}")
-            result = chain.invoke({"text": body_content, "images": images})
+            estimated_tokens = count_tokens(SYSTEM_PROMPT + body_content + "".join(signals)) + content.image_tokens + LLM_EXPECTED_OUTPUT_TOKENS
+            try:
+                async with limits.classify if limits else nullcontext():
+                    output = await self.llm_gateway.call(
+                        lambda: chain.ainvoke({"text": body_content, "images": images}),
+                        user_id=user_id,
+                        estimated_tokens=estimated_tokens,
+                        timer=timer,
+                    )
+            except CheckUnavailable:
+                raise
+            except Exception as e:
+                # The gateway re-raises what retrying cannot fix, e.g. a content filter 400
+                raise ClassificationFailed(f"LLM call failed: {e}") from e
+            usage = getattr(output["raw"], "usage_metadata", None) or {}
+            self.llm_gateway.settle(estimated_tokens, usage.get("total_tokens", estimated_tokens))
+            metrics.count_llm_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+            if output["parsing_error"] is not None:
+                raise ClassificationFailed(f"Unparsable LLM answer: {output['parsing_error']}")
+            result = output["parsed"]
             if result.is_harmful:
                 logger.info(f"[HarmfulChecker] Harmful content detected in {url}: {result.summary_harmful}")
             else:
                 logger.info(f"[HarmfulChecker] No harmful content detected in {url}.")
+            self.decisions["llm"] += 1
+            self._record(url, "llm", result, user_id, page, timer)
+            if self.fingerprints is not None:
+                self.fingerprints.add(page, result)
             return result
+        except CheckUnavailable as e:
+            # Not a verdict (LLM or browser pool out of capacity): let the caller report it and retry later
+            logger.error(f"[HarmfulChecker] Check of {url} not completed: {e}")
+            raise
+        except ClassificationFailed as e:
+            logger.error(f"[HarmfulChecker] Could not classify {url}: {e}")
+            raise
         except Exception as e:
             logger.error(f"[HarmfulChecker] Error checking URL {url}: {e}")
             return None
-        
-harmful_checker = HarmfulChecker()
\ No newline at end of file
+        finally:
+            logger.info(f"[HarmfulChecker] Timings for {url}: {timer}")
@@ -0,0 +1,43 @@
+"""
+Which checker this process uses, without importing it until it is built.
+
+API workers started by ``deploy.py`` use ``RemoteHarmfulChecker`` and must
+not pay for loading playwright, PIL and the LLM client they never use.
+"""
+import threading
+from os import getenv
+from dotenv import load_dotenv
+from utils import metrics
+
+load_dotenv(override=True)
+
+# Configurations
+CHECKER_MODE = getenv("CHECKER_MODE", "local")  # "remote" in API workers started by deploy.py
+
+_harmful_checker = None
+_harmful_checker_lock = threading.Lock()
+
+
+def get_harmful_checker():
+    """
+    The process-wide checker, built on first call.
+
+    Building it loads the prefilter lists and blocks, so the first call must
+    not happen on an event loop that serves requests: the API builds it in
+    its warm-up and routes only use it once ``app.state.checker_ready`` is set.
+
+    :return: HarmfulChecker, or RemoteHarmfulChecker in API workers started by deploy.py
+    """
+    global _harmful_checker
+    with _harmful_checker_lock:
+        if _harmful_checker is None:
+            if CHECKER_MODE == "remote":
+                # Browsers and LLM calls live in the scraper processes of deploy.py
+                from utils.remote_checker import RemoteHarmfulChecker
+                _harmful_checker = RemoteHarmfulChecker()
+                metrics.register_remote_checker(_harmful_checker.stats)
+            else:
+                from utils.checker import HarmfulChecker
+                _harmful_checker = HarmfulChecker()
+                metrics.register_checker(_harmful_checker.stats, _harmful_checker.browser_pool.stats)
+        return _harmful_checker
@@ -0,0 +1,27 @@
+from typing import Optional
+
+
+class CheckUnavailable(Exception):
+    """
+    Raised when a check could not give a verdict because something ran out of
+    capacity or is down; not a verdict, the check should be retried later.
+
+    Routes report it as a 503 (``"retryable": true`` in streams), with
+    ``retry_after`` as the Retry-After header when known.
+    """
+
+    throttled = False  # out of capacity rather than down: "too many checks in progress"
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClassificationFailed(Exception):
+    """
+    Raised when a page with content could not be classified and retrying will
+    not help: the LLM rejected the request (content filter, bad request,
+    authentication) or its answer could not be parsed.
+
+    Not a verdict, and in particular not "no content": routes report it as a 502.
+    """
@@ -0,0 +1,208 @@
+import hashlib
+import re
+import threading
+import time
+from os import getenv
+from typing import Optional
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from logging_config import logger
+
+load_dotenv(override=True)
+
+# Configurations
+PROMPT_TEXT_MAX_TOKENS = int(getenv("PROMPT_TEXT_MAX_TOKENS", "3000"))
+# tiktoken encoding of the model; empty estimates tokens from length. tiktoken
+# downloads it on first use unless TIKTOKEN_CACHE_DIR already holds a copy.
+PROMPT_TOKENIZER = getenv("PROMPT_TOKENIZER", "o200k_base")
+PROMPT_TOKENIZER_RETRY_INTERVAL = float(getenv("PROMPT_TOKENIZER_RETRY_INTERVAL", "300"))  # seconds between load attempts
+PAGE_TEXT_MAX_CHARS = int(getenv("PAGE_TEXT_MAX_CHARS", "100000"))  # cap on text pulled out of the browser
+
+# Runs inside the page and returns only what the classifier needs, so the full
+# DOM is never serialized or parsed again in Python.
+EXTRACT_PAGE_JS = """
+(maxChars) => {
+    const SKIP = "script,style,noscript,template,svg,canvas,iframe,nav,footer,[aria-hidden='true']";
+    const clean = (s) => (s || "").replace(/\\s+/g, " ").trim();
+    const meta = (name) => {
+        const el = document.querySelector(`meta[name='${name}'],meta[property='${name}']`);
+        return el ? clean(el.content) : "";
+    };
+    const visibility = new Map();
+    const isVisible = (el) => {
+        if (visibility.has(el)) return visibility.get(el);
+        let visible;
+        if (el.closest(SKIP)) {
+            visible = false;
+        } else if (typeof el.checkVisibility === "function") {
+            visible = el.checkVisibility({ visibilityProperty: true });
+        } else {
+            const style = getComputedStyle(el);
+            visible = style.display !== "none" && style.visibility !== "hidden";
+        }
+        visibility.set(el, visible);
+        return visible;
+    };
+
+    const chunks = [];
+    let length = 0;
+    if (document.body) {
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        while (length < maxChars && walker.nextNode()) {
+            const node = walker.currentNode;
+            const text = clean(node.nodeValue);
+            if (!text || !node.parentElement || !isVisible(node.parentElement)) continue;
+            chunks.push(text);
+            length += text.length + 1;
+        }
+    }
+
+    const headings = [...document.querySelectorAll("h1,h2,h3")]
+        .map((h) => clean(h.innerText)).filter(Boolean).slice(0, 30);
+    const forms = [...document.querySelectorAll("form")].slice(0, 10).map((form) => ({
+        action: form.action || "",
+        method: (form.method || "get").toLowerCase(),
+        inputs: [...form.querySelectorAll("input,select,textarea")].slice(0, 20)
+            .map((input) => input.type || input.tagName.toLowerCase())
+            .filter((type) => type !== "hidden"),
+    }));
+    const links = [...document.querySelectorAll("a[href]")].slice(0, 300).map((a) => ({
+        href: a.href,
+        text: clean(a.innerText).slice(0, 80),
+    }));
+
+    return {
+        title: clean(document.title),
+        description: meta("description") || meta("og:description"),
+        siteName: meta("og:site_name"),
+        headings,
+        forms,
+        links,
+        text: chunks.join(" ").slice(0, maxChars),
+    };
+}
+"""
+
+_encoding = None
+_encoding_attempted_at: Optional[float] = None
+_encoding_loading = threading.Lock()
+
+
+def load_encoding() -> bool:
+    """
+    Load the tokenizer. Blocking and possibly a download: call it off the
+    event loop while warming up, before the first page is read.
+
+    :return: Whether the tokenizer is loaded; until it is, tokens are estimated from length
+    """
+    global _encoding, _encoding_attempted_at
+    if _encoding is not None or not PROMPT_TOKENIZER:
+        return _encoding is not None
+    with _encoding_loading:
+        if _encoding is None:
+            _encoding_attempted_at = time.monotonic()
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(PROMPT_TOKENIZER)
+            except Exception as e:
+                logger.warning(
+                    f"[Extraction] tiktoken unavailable, estimating tokens from length "
+                    f"and retrying in {PROMPT_TOKENIZER_RETRY_INTERVAL:g}s: {e}"
+                )
+    return _encoding is not None
+
+
+def _get_encoding():
+    global _encoding_attempted_at
+    if _encoding is None and PROMPT_TOKENIZER and not _encoding_loading.locked() and (
+        _encoding_attempted_at is None or time.monotonic() - _encoding_attempted_at > PROMPT_TOKENIZER_RETRY_INTERVAL
+    ):
+        # Never load on the caller's thread, which is usually the checker loop
+        _encoding_attempted_at = time.monotonic()
+        threading.Thread(target=load_encoding, name="load-tokenizer", daemon=True).start()
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    # No token is anywhere near 16 characters, so the tail beyond that never needs encoding
+    tokens = encoding.encode(text[:max_tokens * 16], disallowed_special=())
+    if len(tokens) <= max_tokens and len(text) <= max_tokens * 16:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def normalize_content(text: str) -> str:
+    """Prompt text without its URL line, case and repeated whitespace, so the same page served from different URLs compares equal."""
+    if text.startswith("url: "):
+        text = text.partition("\n")[2]
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of ``normalize_content(text)``."""
+    return hashlib.sha256(normalize_content(text).encode("utf-8")).hexdigest()
+
+
+def _summarize_links(url: str, links: list[dict]) -> list[str]:
+    host = urlsplit(url).hostname or ""
+    external = {}
+    for link in links:
+        try:
+            link_host = urlsplit(link.get("href", "")).hostname
+        except ValueError:
+            continue
+        if link_host and link_host != host:
+            external[link_host] = external.get(link_host, 0) + 1
+    return [f"{link_host} ({count})" for link_host, count in sorted(external.items(), key=lambda item: -item[1])[:20]]
+
+
+def build_prompt_text(url: str, page: Optional[dict], max_tokens: int = PROMPT_TEXT_MAX_TOKENS) -> Optional[str]:
+    """
+    Turn what ``EXTRACT_PAGE_JS`` returned into the text sent to the model.
+
+    The most telling parts (title, meta, headings, forms, where links go) come
+    first so they survive truncation; the body text fills whatever is left of
+    the token budget.
+
+    :param url: URL of the page
+    :param page: Result of ``EXTRACT_PAGE_JS``
+    :param max_tokens: Token budget for the whole text
+    :return: Prompt text, or None if the page has no text at all
+    """
+    if not page:
+        return None
+    sections = [f"url: {url}"]
+    if page.get("title"):
+        sections.append(f"title: {page['title']}")
+    if page.get("siteName"):
+        sections.append(f"site name: {page['siteName']}")
+    if page.get("description"):
+        sections.append(f"description: {page['description']}")
+    if page.get("headings"):
+        sections.append("headings: " + " | ".join(page["headings"]))
+    for form in page.get("forms") or []:
+        sections.append(f"form: {form['method'].upper()} {form['action']} fields: {', '.join(form['inputs'])}")
+    external_links = _summarize_links(url, page.get("links") or [])
+    if external_links:
+        sections.append("external links: " + ", ".join(external_links))
+    has_content = len(sections) > 1 or bool(page.get("text"))
+    if page.get("text"):
+        sections.append(f"text: {page['text']}")
+    if not has_content:
+        return None
+
+    # Curly braces would be read as template variables by the prompt template
+    text = "\n".join(sections).replace("{", "").replace("}", "")
+    return truncate_to_tokens(text, max_tokens)
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from os import getenv
+from typing import Iterable, NamedTuple, Optional
+from dotenv import load_dotenv
+from schemas.checkSchemas import HarmfulCheckerConfig
+from utils.extraction import content_hash, normalize_content
+
+load_dotenv(override=True)
+
+# Configurations
+FINGERPRINT_ENABLED = getenv("FINGERPRINT_ENABLED", "true").lower() == "true"
+FINGERPRINT_INDEX_SIZE = int(getenv("FINGERPRINT_INDEX_SIZE", "50000"))  # pages remembered, least recently matched dropped first
+FINGERPRINT_MAX_DISTANCE = int(getenv("FINGERPRINT_MAX_DISTANCE", "4"))  # differing bits of 64 still counted as the same look
+FINGERPRINT_MIN_TEXT_CHARS = int(getenv("FINGERPRINT_MIN_TEXT_CHARS", "200"))  # shorter texts are too generic to match on
+FINGERPRINT_WARM_ROWS = int(getenv("FINGERPRINT_WARM_ROWS", "20000"))  # recent scans loaded into the index at startup
+
+HASH_BITS = 64
+
+
+class Fingerprint(NamedTuple):
+    text_hash: Optional[str]
+    perceptual_hash: Optional[int]
+    domain: str
+
+
+class FingerprintMatch(NamedTuple):
+    verdict: HarmfulCheckerConfig
+    kind: str  # "text" or "visual"
+    distance: int
+    same_site: bool = True  # False: only a hint, the page still goes to the LLM
+
+
+def fingerprint(page_text: Optional[str], perceptual_hash: Optional[int], domain: str) -> Fingerprint:
+    """
+    :param page_text: Visible body text only: form actions and link targets change
+                      from one mirror of a page to the next
+    :param perceptual_hash: dHash of the top screenshot
+    :param domain: Site key of the page (``utils.urls.site_key``)
+    """
+    text_hash = None
+    if page_text and len(normalize_content(page_text)) >= FINGERPRINT_MIN_TEXT_CHARS:
+        text_hash = content_hash(page_text)
+    return Fingerprint(text_hash, perceptual_hash, domain)
+
+
+def to_signed(value: int) -> int:
+    """Unsigned 64-bit hash to the signed range a Postgres bigint can hold."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def _bands(max_distance: int) -> list[tuple[int, int]]:
+    """(shift, mask) of ``max_distance + 1`` bands covering the 64 bits."""
+    count = min(HASH_BITS, max_distance + 1)
+    bands, start = [], 0
+    for i in range(count):
+        width = HASH_BITS // count + (1 if i < HASH_BITS % count else 0)
+        bands.append((start, (1 << width) - 1))
+        start += width
+    return bands
+
+
+class FingerprintIndex:
+    """
+    Verdicts of pages already classified, found again by content.
+
+    Two pages match when their normalized text is identical, or when the
+    perceptual hashes of their top screenshots differ in at most
+    ``max_distance`` bits. Near neighbours are found with locality-sensitive
+    banding: the hash is cut into ``max_distance + 1`` bands, and two hashes
+    that close must agree on at least one whole band, so only pages sharing a
+    band are compared.
+
+    Neither is proof of the same intent on another site: a phishing kit
+    copies the text and look of the real login page, and challenge or
+    parking pages look alike everywhere. So verdicts are only reused within
+    one site, e.g. for query variants of a page: identical text passes any
+    verdict, a visual match only a harmful one. Identical text on another
+    site that was judged harmful comes back with ``same_site`` False, as a
+    hint for the LLM.
+
+    Not thread-safe: only use it from the checker loop.
+    """
+
+    def __init__(self, max_size: int = FINGERPRINT_INDEX_SIZE, max_distance: int = FINGERPRINT_MAX_DISTANCE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self._bands = _bands(max_distance)
+        self._entries: OrderedDict[int, tuple[Fingerprint, HarmfulCheckerConfig]] = OrderedDict()
+        self._by_text: dict[str, int] = {}
+        self._by_band: list[dict[int, set[int]]] = [{} for _ in self._bands]
+        self._next_id = 0
+        self.text_matches = 0
+        self.visual_matches = 0
+        self.cross_site_hints = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "text_matches": self.text_matches,
+            "visual_matches": self.visual_matches,
+            "cross_site_hints": self.cross_site_hints,
+        }
+
+    def add(self, page: Fingerprint, verdict: HarmfulCheckerConfig) -> None:
+        if page.text_hash is None and page.perceptual_hash is None:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (page, verdict)
+        if page.text_hash is not None:
+            self._by_text[page.text_hash] = entry_id
+        if page.perceptual_hash is not None:
+            for band, (shift, mask) in zip(self._by_band, self._bands):
+                band.setdefault(page.perceptual_hash >> shift & mask, set()).add(entry_id)
+        while len(self._entries) > self.max_size:
+            self._evict(next(iter(self._entries)))
+
+    def load(self, pages: Iterable[tuple[Fingerprint, HarmfulCheckerConfig]]) -> None:
+        """Add pages oldest first, so the newest are the last to be evicted."""
+        for page, verdict in pages:
+            self.add(page, verdict)
+
+    def match(self, page: Fingerprint) -> Optional[FingerprintMatch]:
+        """
+        :param page: Fingerprint of the page about to be classified
+        :return: The verdict of a matching page of the same site, else a harmful page
+                 elsewhere with the same text (``same_site`` False), or None
+        """
+        hint = None
+        if page.text_hash is not None:
+            entry_id = self._by_text.get(page.text_hash)
+            if entry_id is not None:
+                stored, verdict = self._entries[entry_id]
+                if stored.domain == page.domain:
+                    self._entries.move_to_end(entry_id)
+                    self.text_matches += 1
+                    return FingerprintMatch(verdict, "text", 0)
+                if verdict.is_harmful:
+                    hint = FingerprintMatch(verdict, "text", 0, same_site=False)
+
+        if page.perceptual_hash is None:
+            return self._hint(hint)
+        best_id, best_distance = None, self.max_distance + 1
+        for band, (shift, mask) in zip(self._by_band, self._bands):
+            for entry_id in band.get(page.perceptual_hash >> shift & mask, ()):
+                stored, verdict = self._entries[entry_id]
+                if not verdict.is_harmful or stored.domain != page.domain:
+                    continue
+                distance = (stored.perceptual_hash ^ page.perceptual_hash).bit_count()
+                if distance < best_distance:
+                    best_id, best_distance = entry_id, distance
+        if best_id is None:
+            return self._hint(hint)
+        self._entries.move_to_end(best_id)
+        self.visual_matches += 1
+        return FingerprintMatch(self._entries[best_id][1], "visual", best_distance)
+
+    def _hint(self, hint: Optional[FingerprintMatch]) -> Optional[FingerprintMatch]:
+        if hint is not None:
+            self.cross_site_hints += 1
+        return hint
+
+    def _evict(self, entry_id: int) -> None:
+        page, _ = self._entries.pop(entry_id)
+        if page.text_hash is not None and self._by_text.get(page.text_hash) == entry_id:
+            del self._by_text[page.text_hash]
+        if page.perceptual_hash is not None:
+            for band, (shift, mask) in zip(self._by_band, self._bands):
+                key = page.perceptual_hash >> shift & mask
+                members = band.get(key)
+                if members is not None:
+                    members.discard(entry_id)
+                    if not members:
+                        del band[key]
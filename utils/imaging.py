@@ -0,0 +1,125 @@
+import base64
+import io
+import math
+from os import getenv
+from typing import Optional
+from dotenv import load_dotenv
+from PIL import Image, ImageChops, ImageStat
+
+load_dotenv(override=True)
+
+# Configurations
+SCREENSHOT_VIEWPORT_WIDTH = int(getenv("SCREENSHOT_VIEWPORT_WIDTH", "1280"))
+SCREENSHOT_VIEWPORT_HEIGHT = int(getenv("SCREENSHOT_VIEWPORT_HEIGHT", "800"))
+SCREENSHOT_MAX_WIDTH = int(getenv("SCREENSHOT_MAX_WIDTH", "768"))  # downscale target, 0 keeps the original size
+SCREENSHOT_FORMAT = getenv("SCREENSHOT_FORMAT", "jpeg").lower()  # jpeg, webp or png
+SCREENSHOT_QUALITY = int(getenv("SCREENSHOT_QUALITY", "70"))
+SCREENSHOT_MERGE = getenv("SCREENSHOT_MERGE", "false").lower() == "true"  # stack both frames into one image
+SCREENSHOT_DUPLICATE_THRESHOLD = float(getenv("SCREENSHOT_DUPLICATE_THRESHOLD", "2.0"))  # mean pixel difference, 0-255
+PERCEPTUAL_HASH_MIN_CONTRAST = float(getenv("PERCEPTUAL_HASH_MIN_CONTRAST", "8.0"))  # pixel stddev, 0-255
+
+VIEWPORT = {"width": SCREENSHOT_VIEWPORT_WIDTH, "height": SCREENSHOT_VIEWPORT_HEIGHT}
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+def is_duplicate(first: Image.Image, second: Image.Image, threshold: float = SCREENSHOT_DUPLICATE_THRESHOLD) -> bool:
+    """Compare small grayscale thumbnails, so near-identical frames (a blinking cursor, a carousel tick) count as equal."""
+    if first.size != second.size:
+        return False
+    size = (64, max(1, 64 * first.height // first.width))
+    a = first.convert("L").resize(size)
+    b = second.convert("L").resize(size)
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0] <= threshold
+
+
+def dhash(image: Image.Image, size: int = 8, min_contrast: float = PERCEPTUAL_HASH_MIN_CONTRAST) -> Optional[int]:
+    """
+    64-bit difference hash: whether each pixel of a (size+1)xsize grayscale
+    thumbnail is brighter than its right neighbour. Similar-looking pages differ
+    in only a few bits.
+
+    :return: The hash, or None for nearly flat images (blank or loading pages),
+             which would all hash alike
+    """
+    thumbnail = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    if ImageStat.Stat(thumbnail).stddev[0] < min_contrast:
+        return None
+    pixels = list(thumbnail.getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            index = row * (size + 1) + col
+            value = value << 1 | (pixels[index] > pixels[index + 1])
+    return value
+
+
+def downscale(image: Image.Image, max_width: int = SCREENSHOT_MAX_WIDTH) -> Image.Image:
+    if not max_width or image.width <= max_width:
+        return image
+    height = round(image.height * max_width / image.width)
+    return image.resize((max_width, height), Image.LANCZOS)
+
+
+def merge_vertically(frames: list[Image.Image]) -> Image.Image:
+    width = max(frame.width for frame in frames)
+    merged = Image.new("RGB", (width, sum(frame.height for frame in frames)), "white")
+    top = 0
+    for frame in frames:
+        merged.paste(frame, (0, top))
+        top += frame.height
+    return merged
+
+
+def encode(image: Image.Image, image_format: str = SCREENSHOT_FORMAT, quality: int = SCREENSHOT_QUALITY) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.convert("RGB").save(buffer, format=image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Vision tokens of a high-detail image: fit in 2048x2048, shortest side to 768, 170 per 512px tile plus 85."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def prepare_screenshots(frames: list[bytes], merge: bool = SCREENSHOT_MERGE) -> tuple[Optional[dict], dict]:
+    """
+    Turn raw PNG screenshots into the data URLs sent to the model.
+
+    A second frame that looks the same as the first is dropped; the rest are
+    downscaled, optionally merged into one image and re-encoded.
+
+    :param frames: PNG screenshots, top of the page first
+    :param merge: Stack the frames into a single image
+    :return: Images keyed "first"/"second" (or None), and size stats for logging plus the
+             perceptual hash of the top of the page
+    """
+    images = [Image.open(io.BytesIO(frame)) for frame in frames]
+    perceptual_hash = dhash(images[0]) if images else None
+    if len(images) > 1 and is_duplicate(images[0], images[1]):
+        images = images[:1]
+    images = [downscale(image) for image in images]
+    if merge and len(images) > 1:
+        images = [merge_vertically(images)]
+
+    encoded = [encode(image) for image in images]
+    mime_type = MIME_TYPES.get(SCREENSHOT_FORMAT, "image/png")
+    data_urls = {
+        key: f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+        for key, data in zip(("first", "second"), encoded)
+    }
+    stats = {
+        "frames": len(encoded),
+        "raw_bytes": sum(len(frame) for frame in frames),
+        "bytes": sum(len(data) for data in encoded),
+        "tokens": sum(estimate_image_tokens(*image.size) for image in images),
+        "perceptual_hash": perceptual_hash,
+    }
+    return data_urls or None, stats
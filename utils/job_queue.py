@@ -0,0 +1,156 @@
+from datetime import timedelta
+from os import getenv
+from typing import Optional
+from uuid import UUID
+from dotenv import load_dotenv
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import CheckJob
+from utils.urls import normalize_url
+
+load_dotenv(override=True)
+
+# Configurations
+JOB_MAX_ATTEMPTS = int(getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(getenv("JOB_RETRY_BACKOFF", "10"))  # seconds, doubled on every attempt
+JOB_STALE_AFTER = int(getenv("JOB_STALE_AFTER", "300"))  # seconds a job may stay running before it is re-queued
+
+PRIORITIES = {"interactive": 0, "bulk": 1}
+ACTIVE_STATUSES = ("queued", "running")
+
+
+async def submit_job(
+    db: AsyncSession, url: str, user_id: Optional[str], priority: int, bypass_cache: bool = False
+) -> tuple[CheckJob, bool]:
+    """
+    Queue a check, or join the active job for the same normalized URL.
+
+    Joining adds the user to the job's submitters. Joining an active bulk job
+    from the interactive lane promotes it, and joining a queued job with
+    ``bypass_cache`` makes it bypass the cache; a running job keeps its
+    setting, which the caller sees in the returned job's ``bypass_cache``.
+
+    :param db: SQLAlchemy async session object
+    :param url: URL to check
+    :param user_id: ID of the submitting user
+    :param priority: 0 for interactive, 1 for bulk
+    :param bypass_cache: Ignore cached verdicts when the job runs
+    :return: The new or the existing CheckJob, and whether an existing job was joined
+    """
+    url_key = normalize_url(url)
+    statement = insert(CheckJob).values(
+        url=url,
+        url_key=url_key,
+        user_id=user_id,
+        submitter_ids=[UUID(user_id)] if user_id else [],
+        priority=priority,
+        bypass_cache=bypass_cache,
+        max_attempts=JOB_MAX_ATTEMPTS,
+    ).on_conflict_do_nothing(
+        index_elements=[CheckJob.url_key],
+        index_where=text("status IN ('queued', 'running')"),
+    ).returning(CheckJob.id)
+    job_id = (await db.execute(statement)).scalar()
+    if job_id is None:
+        active = select(CheckJob).where(CheckJob.url_key == url_key, CheckJob.status.in_(ACTIVE_STATUSES)).with_for_update()
+        job = (await db.execute(active)).scalars().first()
+        if job is None:
+            # The active job finished between the insert and the lookup
+            await db.rollback()
+            return await submit_job(db, url, user_id, priority, bypass_cache)
+        if priority < job.priority:
+            job.priority = priority
+        if bypass_cache and not job.bypass_cache and job.status == "queued":
+            job.bypass_cache = True
+        if user_id and UUID(user_id) not in job.submitter_ids:
+            job.submitter_ids = [*job.submitter_ids, UUID(user_id)]
+    else:
+        job = await db.get(CheckJob, job_id)
+    await db.commit()
+    await db.refresh(job)
+    return job, job_id is None
+
+
+async def get_job(db: AsyncSession, job_id: UUID, user_id: str) -> Optional[CheckJob]:
+    """
+    :return: The job, or None if it does not exist or ``user_id`` never submitted it
+    """
+    statement = select(CheckJob).where(CheckJob.id == job_id, CheckJob.submitter_ids.any(UUID(user_id)))
+    return (await db.execute(statement)).scalars().first()
+
+
+async def claim_job(db: AsyncSession, lanes: list[int]) -> Optional[CheckJob]:
+    """
+    Atomically take the oldest runnable job, trying the lanes in order.
+
+    :param db: SQLAlchemy async session object
+    :param lanes: Priorities to take work from, most preferred first
+    :return: The claimed CheckJob, now marked running, or None if every lane is empty
+    """
+    for priority in lanes:
+        next_job = (
+            select(CheckJob.id)
+            .where(CheckJob.status == "queued", CheckJob.priority == priority, CheckJob.available_at <= func.now())
+            .order_by(CheckJob.available_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        statement = (
+            update(CheckJob)
+            .where(CheckJob.id == next_job)
+            .values(status="running", attempts=CheckJob.attempts + 1, started_at=func.now())
+            .returning(CheckJob.id)
+        )
+        job_id = (await db.execute(statement)).scalar()
+        await db.commit()
+        if job_id is not None:
+            return await db.get(CheckJob, job_id)
+    return None
+
+
+async def complete_job(db: AsyncSession, job: CheckJob, result: dict) -> None:
+    job.status = "done"
+    job.result = result
+    job.error = None
+    job.finished_at = func.now()
+    await db.commit()
+
+
+async def fail_job(db: AsyncSession, job: CheckJob, error: str) -> None:
+    """
+    Record a failed attempt. The job goes back to the queue with exponential
+    backoff until it runs out of attempts.
+    """
+    job.error = error
+    if job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.available_at = func.now() + timedelta(seconds=JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1))
+    else:
+        job.status = "failed"
+        job.finished_at = func.now()
+    await db.commit()
+
+
+async def requeue_stale_jobs(db: AsyncSession) -> int:
+    """
+    Put back jobs whose worker died while running them, or fail them if they
+    have no attempts left.
+
+    :param db: SQLAlchemy async session object
+    :return: Number of re-queued jobs
+    """
+    stale = (CheckJob.status == "running", CheckJob.started_at < func.now() - timedelta(seconds=JOB_STALE_AFTER))
+    await db.execute(
+        update(CheckJob)
+        .where(*stale, CheckJob.attempts >= CheckJob.max_attempts)
+        .values(status="failed", error="Worker stopped while running the job", finished_at=func.now())
+    )
+    count = (await db.execute(
+        update(CheckJob)
+        .where(*stale)
+        .values(status="queued", available_at=func.now())
+    )).rowcount
+    await db.commit()
+    return count
@@ -0,0 +1,298 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import nullcontext
+from os import getenv
+from typing import Any, Awaitable, Callable, Optional
+from dotenv import load_dotenv
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from logging_config import logger
+from utils.errors import CheckUnavailable
+from utils.timing import StageTimer
+
+load_dotenv(override=True)
+
+# Configurations
+LLM_MAX_CONCURRENCY = int(getenv("LLM_MAX_CONCURRENCY", "8"))  # LLM calls in flight across all users
+LLM_TOKENS_PER_MINUTE = int(getenv("LLM_TOKENS_PER_MINUTE", "150000"))  # deployment quota, 0 disables the limit
+LLM_MAX_QUEUED = int(getenv("LLM_MAX_QUEUED", "64"))  # calls allowed to wait for a slot
+LLM_QUEUE_TIMEOUT = float(getenv("LLM_QUEUE_TIMEOUT", "60"))  # seconds a call may wait for a slot and tokens
+LLM_MAX_ATTEMPTS = int(getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_RETRY_MAX_WAIT = float(getenv("LLM_RETRY_MAX_WAIT", "20"))  # seconds, cap of one backoff
+
+ANONYMOUS = "anonymous"
+
+
+class LLMUnavailable(CheckUnavailable):
+    """Raised when the LLM could not give a verdict because of a transient failure; the check should be retried later."""
+
+
+class LLMThrottled(LLMUnavailable):
+    """Raised when the LLM rate limit or the gateway queue is exhausted."""
+
+    throttled = True
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    # openai is imported once a call fails, not at startup, where it costs most of a second
+    from openai import APIStatusError
+
+    return error.status_code if isinstance(error, APIStatusError) else None
+
+
+def _is_retryable(error: BaseException) -> bool:
+    from openai import APIConnectionError, APITimeoutError
+
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    status_code = _status_code(error)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    from openai import APIStatusError
+
+    if not isinstance(error, APIStatusError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute limit, refilled continuously.
+
+    Callers take an estimate before the call and ``settle`` the difference
+    once the real usage is known, so the balance may briefly go negative.
+    Not thread-safe: only use it from the checker loop.
+    """
+
+    def __init__(self, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, tokens: int, timeout: float) -> None:
+        """
+        :raises LLMThrottled: If the tokens will not be available within ``timeout`` seconds
+        """
+        if not self.enabled:
+            return
+        tokens = min(tokens, self.capacity)
+        deadline = time.monotonic() + timeout
+        # The lock keeps takers in arrival order, so a large prompt is not starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    raise LLMThrottled(f"Token budget of {self.capacity}/min exhausted", retry_after=wait)
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        if self.enabled:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + estimated - actual)
+
+    def drain(self) -> None:
+        """Empty the bucket after the provider answered 429, so every caller backs off."""
+        if self.enabled:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class LLMGateway:
+    """
+    Single door for every LLM call of the process.
+
+    Calls get one of ``max_concurrency`` slots, handed out round-robin across
+    user ids so one user's batch cannot starve everyone else, then take their
+    estimated tokens from a ``TokenBucket``. Rate limits and server errors are
+    retried with jittered exponential backoff; when the wait or the retries
+    run out, the call fails with ``LLMThrottled`` or ``LLMUnavailable``
+    instead of looking like a verdict.
+
+    Not thread-safe: only use it from the checker loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        max_queued: int = LLM_MAX_QUEUED,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        retry_max_wait: float = LLM_RETRY_MAX_WAIT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_attempts = max_attempts
+        self.retry_max_wait = retry_max_wait
+        self.bucket = TokenBucket(tokens_per_minute)
+        self._active = 0
+        self._queued = 0
+        self._queues: dict[str, deque] = {}
+        self._rotation: deque = deque()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "tokens_available": int(self.bucket.tokens) if self.bucket.enabled else None,
+        }
+
+    async def call(
+        self, fn: Callable[[], Awaitable[Any]], user_id: Optional[str] = None, estimated_tokens: int = 0,
+        timer: Optional[StageTimer] = None,
+    ) -> Any:
+        """
+        Run one LLM call under the gateway's limits.
+
+        :param fn: Coroutine function making the call; it is called again on every retry
+        :param user_id: Whose turn the call takes in the fair queue
+        :param estimated_tokens: Prompt plus expected completion tokens; ``settle`` corrects it after a
+            successful call, a failed one gives it back
+        :param timer: Gets the wait for a slot and tokens as stage "llm_queue", and the provider call,
+            retries included, as stage "llm"
+        :return: Whatever ``fn`` returns
+        :raises LLMThrottled: If the queue is full, the wait timed out or the provider kept answering 429
+        :raises LLMUnavailable: If the provider kept failing with server or connection errors
+        """
+        started = time.monotonic()
+        with timer.stage("llm_queue") if timer else nullcontext():
+            try:
+                await self._acquire_slot(str(user_id or ANONYMOUS))
+            except LLMThrottled:
+                self.throttled += 1
+                raise
+            try:
+                await self.bucket.take(estimated_tokens, max(0.0, self.queue_timeout - (time.monotonic() - started)))
+            except BaseException as e:
+                self._release_slot()
+                if isinstance(e, LLMThrottled):
+                    self.throttled += 1
+                raise
+        try:
+            self.calls += 1
+            with timer.stage("llm") if timer else nullcontext():
+                return await self._call_with_retries(fn)
+        except BaseException:
+            # No usage to settle against: give the whole estimate back
+            self.bucket.settle(estimated_tokens, 0)
+            raise
+        finally:
+            self._release_slot()
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token budget once the real usage of a call is known."""
+        self.bucket.settle(estimated_tokens, actual_tokens)
+
+    async def _call_with_retries(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=self._backoff,
+            retry=retry_if_exception(_is_retryable),
+            before_sleep=self._before_retry,
+            reraise=True,
+        )
+        try:
+            async for attempt in retrying:
+                with attempt:
+                    return await fn()
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            if _status_code(e) == 429:
+                self.throttled += 1
+                raise LLMThrottled(f"LLM rate limited after {self.max_attempts} attempts", retry_after=_retry_after(e)) from e
+            self.failures += 1
+            raise LLMUnavailable(f"LLM unavailable after {self.max_attempts} attempts: {e}") from e
+
+    def _backoff(self, retry_state) -> float:
+        jittered = wait_random_exponential(multiplier=1, max=self.retry_max_wait)(retry_state)
+        retry_after = _retry_after(retry_state.outcome.exception())
+        return max(jittered, min(retry_after, self.retry_max_wait)) if retry_after else jittered
+
+    def _before_retry(self, retry_state) -> None:
+        error = retry_state.outcome.exception()
+        self.retries += 1
+        if _status_code(error) == 429:
+            self.bucket.drain()
+        logger.warning(
+            f"[LLMGateway] Attempt {retry_state.attempt_number} failed ({error}); "
+            f"retrying in {retry_state.next_action.sleep:.1f}s"
+        )
+
+    async def _acquire_slot(self, user_id: str) -> None:
+        if self._active < self.max_concurrency and not self._rotation:
+            self._active += 1
+            return
+        if self._queued >= self.max_queued:
+            raise LLMThrottled(f"{self._queued} LLM calls already waiting", retry_after=self.queue_timeout)
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._rotation.append(user_id)
+        queue.append(future)
+        self._queued += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the wait gave up
+                self._release_slot()
+            if isinstance(e, asyncio.TimeoutError):
+                raise LLMThrottled(f"No LLM slot free after {self.queue_timeout}s", retry_after=self.queue_timeout)
+            raise
+        finally:
+            self._queued -= 1
+
+    def _release_slot(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the next waiting call of each user in turn, skipping calls that gave up."""
+        while self._active < self.max_concurrency and self._rotation:
+            user_id = self._rotation.popleft()
+            queue = self._queues[user_id]
+            while queue and queue[0].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+                continue
+            future = queue.popleft()
+            if queue:
+                self._rotation.append(user_id)
+            else:
+                del self._queues[user_id]
+            self._active += 1
+            future.set_result(None)
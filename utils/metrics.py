@@ -0,0 +1,131 @@
+from os import getenv
+from typing import Callable
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Configurations
+METRICS_ENABLED = getenv("METRICS_ENABLED", "false").lower() == "true"
+
+# Seconds; checks range from a cache hit to a 40 s scrape plus LLM call
+STAGE_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+if METRICS_ENABLED:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+    registry = CollectorRegistry()
+    stage_seconds = Histogram(
+        "harmful_check_stage_seconds", "Time spent in each stage of a check",
+        ["stage"], buckets=STAGE_BUCKETS, registry=registry,
+    )
+    stage_failures = Counter(
+        "harmful_check_stage_failures_total", "Stages that raised an error",
+        ["stage"], registry=registry,
+    )
+    llm_tokens = Counter(
+        "harmful_check_llm_tokens_total", "Tokens sent to and received from the LLM",
+        ["direction"], registry=registry,
+    )
+
+
+def observe_stage(stage: str, seconds: float, failed: bool = False) -> None:
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.labels(stage).observe(seconds)
+    if failed:
+        stage_failures.labels(stage).inc()
+
+
+def count_llm_tokens(input_tokens: int, output_tokens: int) -> None:
+    if not METRICS_ENABLED:
+        return
+    llm_tokens.labels("input").inc(input_tokens)
+    llm_tokens.labels("output").inc(output_tokens)
+
+
+class _CheckerCollector:
+    """Reads the counters the checker already keeps, only when /metrics is scraped."""
+
+    def __init__(self, checker_stats: Callable[[], dict], pool_stats: Callable[[], dict]):
+        self.checker_stats = checker_stats
+        self.pool_stats = pool_stats
+
+    def collect(self):
+        stats = self.checker_stats()
+        decisions = CounterMetricFamily("harmful_check_decisions", "Checks decided per tier", labels=["tier"])
+        for tier, count in stats["decisions"].items():
+            decisions.add_metric([tier], count)
+        yield decisions
+
+        cache = CounterMetricFamily("harmful_check_cache_lookups", "Verdict cache lookups", labels=["result"])
+        for result in ("hits", "db_hits", "misses"):
+            cache.add_metric([result], stats["verdict_cache"][result])
+        yield cache
+        yield GaugeMetricFamily("harmful_check_cache_entries", "Verdicts in the in-process cache", value=stats["verdict_cache"]["size"])
+
+        flights = stats["single_flight"]
+        yield CounterMetricFamily("harmful_check_coalesced", "Checks that joined an in-flight check of the same URL", value=flights["coalesced"])
+        yield CounterMetricFamily("harmful_check_flight_failures", "Shared checks that raised an error", value=flights["failures"])
+        yield GaugeMetricFamily("harmful_check_in_flight", "Distinct URLs being checked", value=flights["in_flight"])
+
+        gateway = stats["llm_gateway"]
+        yield GaugeMetricFamily("llm_gateway_active", "LLM calls in flight", value=gateway["active"])
+        yield GaugeMetricFamily("llm_gateway_queued", "LLM calls waiting for a slot", value=gateway["queued"])
+        yield CounterMetricFamily("llm_gateway_retries", "LLM calls retried after a 429 or server error", value=gateway["retries"])
+        yield CounterMetricFamily("llm_gateway_throttled", "Checks failed because of the LLM rate limit", value=gateway["throttled"])
+        yield CounterMetricFamily("llm_gateway_failures", "Checks failed because the LLM kept erroring", value=gateway["failures"])
+
+        history = stats["scan_history"]
+        if history is not None:
+            yield CounterMetricFamily("scan_history_written", "Scans written to the history table", value=history["written"])
+            yield CounterMetricFamily("scan_history_lost", "Scans dropped or failed to write", value=history["dropped"] + history["failed"])
+            yield GaugeMetricFamily("scan_history_buffered", "Scans waiting to be written", value=history["buffered"])
+
+        fingerprints = stats["fingerprints"]
+        if fingerprints is not None:
+            yield GaugeMetricFamily("fingerprint_index_size", "Classified pages in the fingerprint index", value=fingerprints["size"])
+
+        pool = self.pool_stats()
+        yield GaugeMetricFamily("browser_pool_size", "Browsers in the pool", value=pool["size"])
+        yield GaugeMetricFamily("browser_pool_idle", "Browsers waiting for work", value=pool["idle"])
+        yield GaugeMetricFamily("browser_pool_waiters", "Checks waiting for a browser", value=pool["waiters"])
+
+
+class _RemoteCheckerCollector:
+    """Queue counters of an API worker started by deploy.py; its checks run in the scraper processes."""
+
+    def __init__(self, checker_stats: Callable[[], dict]):
+        self.checker_stats = checker_stats
+
+    def collect(self):
+        stats = self.checker_stats()
+        yield GaugeMetricFamily("scraper_queue_pending", "Checks waiting for a scraper to answer", value=stats["pending"])
+        yield CounterMetricFamily("scraper_queue_submitted", "Checks handed to the scrapers", value=stats["submitted"])
+        yield CounterMetricFamily("scraper_queue_timeouts", "Checks the scrapers did not answer in time", value=stats["timeouts"])
+        yield CounterMetricFamily("scraper_queue_disconnects", "Times the connection to the check queue was lost", value=stats["disconnects"])
+
+
+def register_checker(checker_stats: Callable[[], dict], pool_stats: Callable[[], dict]) -> None:
+    if METRICS_ENABLED:
+        registry.register(_CheckerCollector(checker_stats, pool_stats))
+
+
+def register_remote_checker(checker_stats: Callable[[], dict]) -> None:
+    if METRICS_ENABLED:
+        registry.register(_RemoteCheckerCollector(checker_stats))
+
+
+def serve(port: int) -> None:
+    """Expose the metrics on their own port, for processes that do not run the API (the scrapers of deploy.py)."""
+    if METRICS_ENABLED:
+        from prometheus_client import start_http_server
+
+        start_http_server(port, registry=registry)
+
+
+def render() -> tuple[bytes, str]:
+    """
+    :return: Prometheus text exposition of every metric and its content type
+    """
+    return generate_latest(registry), CONTENT_TYPE_LATEST
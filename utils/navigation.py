@@ -0,0 +1,103 @@
+import asyncio
+from os import getenv
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from playwright.async_api import BrowserContext, Page, Request, Route, Error as PlaywrightError
+from utils.prefilter import DomainIndex
+from utils.timing import StageTimer
+
+load_dotenv(override=True)
+
+# Configurations
+BLOCKED_RESOURCE_TYPES = {t.strip() for t in getenv("BLOCKED_RESOURCE_TYPES", "media,font").split(",") if t.strip()}
+BLOCK_TRACKERS = getenv("BLOCK_TRACKERS", "true").lower() == "true"
+NAVIGATION_DEADLINE = int(getenv("NAVIGATION_DEADLINE", "20000"))  # ms for navigation and readiness together
+QUIET_WINDOW = int(getenv("QUIET_WINDOW", "500"))  # ms without network activity that counts as ready
+MAX_QUIET_WAIT = int(getenv("MAX_QUIET_WAIT", "5000"))  # ms to wait for the quiet window after DOMContentLoaded
+
+# Analytics, ad and tag-manager hosts that never affect what the page shows
+TRACKER_DOMAINS = [
+    "*.google-analytics.com", "*.googletagmanager.com", "*.googlesyndication.com", "*.googleadservices.com",
+    "*.doubleclick.net", "*.adservice.google.com", "*.facebook.net", "*.hotjar.com", "*.clarity.ms",
+    "*.scorecardresearch.com", "*.adnxs.com", "*.criteo.com", "*.criteo.net", "*.taboola.com",
+    "*.outbrain.com", "*.histats.com", "*.statcounter.com", "*.mc.yandex.ru", "*.bat.bing.com",
+    "*.analytics.tiktok.com", "*.amazon-adsystem.com", "*.pubmatic.com", "*.rubiconproject.com",
+    "*.popads.net", "*.propellerads.com", "*.adsterra.com", "*.onesignal.com",
+]
+
+tracker_index = DomainIndex(TRACKER_DOMAINS)
+
+
+async def install_request_blocking(context: BrowserContext) -> None:
+    """Abort requests for resources the checker never looks at."""
+    if not BLOCKED_RESOURCE_TYPES and not BLOCK_TRACKERS:
+        return
+
+    async def handle(route: Route) -> None:
+        request = route.request
+        blocked = request.resource_type in BLOCKED_RESOURCE_TYPES or (
+            BLOCK_TRACKERS and tracker_index.match(urlsplit(request.url).hostname or "")
+        )
+        try:
+            if blocked:
+                await route.abort("blockedbyclient")
+            else:
+                await route.continue_()
+        except PlaywrightError:
+            pass  # the page navigated away or closed while the request was pending
+
+    await context.route("**/*", handle)
+
+
+class NetworkActivity:
+    """Tracks in-flight requests of a page; attach it before navigating."""
+
+    def __init__(self, page: Page):
+        self.in_flight = 0
+        self.last_change = asyncio.get_running_loop().time()
+        page.on("request", self._started)
+        page.on("requestfinished", self._finished)
+        page.on("requestfailed", self._finished)
+
+    def _started(self, request: Request) -> None:
+        self.in_flight += 1
+        self.last_change = asyncio.get_running_loop().time()
+
+    def _finished(self, request: Request) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self.last_change = asyncio.get_running_loop().time()
+
+    async def wait_for_quiet(self, quiet_ms: int = QUIET_WINDOW, timeout_ms: int = MAX_QUIET_WAIT) -> bool:
+        """
+        Wait until no request has started or finished for ``quiet_ms``.
+
+        :return: True if the page went quiet, False if ``timeout_ms`` ran out first
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_ms / 1000
+        while loop.time() < deadline:
+            idle_for = loop.time() - self.last_change
+            if self.in_flight == 0 and idle_for >= quiet_ms / 1000:
+                return True
+            await asyncio.sleep(min(0.1, max(0.0, deadline - loop.time())))
+        return False
+
+
+async def load_page(page: Page, url: str, timer: StageTimer, deadline_ms: int = NAVIGATION_DEADLINE) -> bool:
+    """
+    Navigate to ``url`` and wait until it is ready to read.
+
+    Ready means DOMContentLoaded followed by a short window without network
+    activity, all within ``deadline_ms``. Pages that keep polling or streaming
+    are read as they are once the deadline or ``MAX_QUIET_WAIT`` is reached.
+
+    :return: True if the page went quiet before being read
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    activity = NetworkActivity(page)
+    with timer.stage("navigate"):
+        await page.goto(url, timeout=deadline_ms, wait_until="domcontentloaded")
+    remaining = deadline_ms - (loop.time() - started) * 1000
+    with timer.stage("load_wait"):
+        return await activity.wait_for_quiet(timeout_ms=max(0, min(MAX_QUIET_WAIT, remaining)))
@@ -0,0 +1,263 @@
+import hashlib
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from os import getenv
+from typing import Iterable, NamedTuple, Optional
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+from logging_config import logger
+from schemas.checkSchemas import HarmfulCheckerConfig
+from utils.urls import normalize_host, registrable_domain
+
+load_dotenv(override=True)
+
+# Configurations
+PREFILTER_ENABLED = getenv("PREFILTER_ENABLED", "true").lower() == "true"
+PREFILTER_ALLOWLIST = getenv("PREFILTER_ALLOWLIST", "")  # path to a domain list, one entry per line
+PREFILTER_DENYLIST = getenv("PREFILTER_DENYLIST", "")
+PREFILTER_SIGNAL_SCORE = float(getenv("PREFILTER_SIGNAL_SCORE", "8"))  # keyword score worth pointing out to the LLM
+
+# Exact hosts only: subdomains of these (forms, user pages) are routinely
+# abused and still go through the full check. Hosts with open redirectors
+# (google.com/url, youtube.com/redirect, facebook.com/l.php) or user content
+# under their own name (github.com/<user>) are deliberately left out.
+DEFAULT_ALLOWLIST = [
+    "wikipedia.org", "en.wikipedia.org", "id.wikipedia.org", "microsoft.com", "apple.com", "whatsapp.com",
+    "tokopedia.com", "shopee.co.id", "detik.com", "kompas.com",
+]
+
+# Brands whose domains get imitated by phishing pages
+DEFAULT_BRANDS = [
+    "google.com", "facebook.com", "instagram.com", "whatsapp.com", "paypal.com", "apple.com",
+    "microsoft.com", "netflix.com", "amazon.com", "tokopedia.com", "shopee.co.id", "gojek.com",
+    "klikbca.com", "bca.co.id", "bankmandiri.co.id", "bri.co.id", "bni.co.id", "dana.id", "ovo.id",
+]
+
+# Words that turn a brand name into a phishing domain (paypal-login, bca-verifikasi)
+COMBOSQUAT_WORDS = {
+    "login", "signin", "secure", "security", "verify", "verification", "verifikasi", "account", "akun",
+    "support", "update", "bonus", "promo", "hadiah", "claim", "klaim", "wallet", "auth", "help", "cs",
+}
+
+# (pattern, weight, category) applied to the visible text of the page
+DEFAULT_KEYWORD_RULES = [
+    (r"\bslot\s*gacor\b", 4, "online gambling"),
+    (r"\bjudi\s*(online|bola|slot)\b", 4, "online gambling"),
+    (r"\btogel\b", 3, "online gambling"),
+    (r"\bmaxwin\b", 3, "online gambling"),
+    (r"\brtp\s*(live|slot)\b", 3, "online gambling"),
+    (r"\b(situs|link|agen|bandar)\s*(slot|judi|togel|bola)\b", 3, "online gambling"),
+    (r"\bdeposit\s*(pulsa|dana|ovo|gopay)\b", 2, "online gambling"),
+    (r"\b(scatter|jackpot|freespin|free\s*spin)\b", 1, "online gambling"),
+    (r"\b(sbobet|pragmatic\s*play|pg\s*soft|casino\s*online|poker\s*online|sportsbook)\b", 2, "online gambling"),
+    (r"\b(verify|confirm|update)\s+your\s+(account|identity|password|billing)\b", 3, "phishing"),
+    (r"\byour\s+account\s+(has\s+been\s+)?(suspended|locked|limited|disabled)\b", 3, "phishing"),
+    (r"\bverifikasi\s+(akun|data|identitas)\b", 2, "phishing"),
+    (r"\bakun\s+anda\s+(telah\s+)?(diblokir|dinonaktifkan|ditangguhkan)\b", 3, "phishing"),
+    (r"\b(seed|recovery|secret)\s+phrase\b", 3, "phishing"),
+    (r"\b(kode\s+otp|one[-\s]time\s+password)\b", 2, "phishing"),
+    (r"\b(nonton|streaming|download)\s+film\s+(gratis|sub\s*indo)\b", 3, "pirating"),
+    (r"\b(cracked?|keygen|serial\s+key)\s+(full\s+version|download)\b", 3, "pirating"),
+]
+
+# Letters commonly swapped in for one another in lookalike domains
+CONFUSABLES = str.maketrans({
+    "0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "i": "l",
+    "а": "a", "е": "e", "о": "o", "р": "p", "с": "c", "у": "y", "х": "x", "і": "l",
+    "ј": "j", "ѕ": "s", "ԁ": "d", "ɡ": "g", "ո": "n", "ı": "l",
+})
+
+
+def _domain_hash(domain: str) -> int:
+    return int.from_bytes(hashlib.blake2b(domain.encode(), digest_size=8).digest(), "little")
+
+
+class DomainIndex:
+    """
+    Compact lookup table for large domain lists.
+
+    Entries are stored as sorted 64-bit hashes (8 bytes each, so millions of
+    domains fit in tens of MB). A plain entry ``example.com`` matches that
+    host and ``www.example.com``; ``*.example.com`` or ``.example.com``
+    matches the domain and every subdomain.
+    """
+
+    def __init__(self, domains: Iterable[str] = ()):
+        exact, suffixes = [], []
+        for domain in domains:
+            domain = domain.strip().lower()
+            if not domain or domain.startswith("#"):
+                continue
+            if domain.startswith(("*.", ".")):
+                suffixes.append(_domain_hash(normalize_host(domain.lstrip("*."))))
+            else:
+                exact.append(_domain_hash(normalize_host(domain)))
+        self._exact = array("Q", sorted(set(exact)))
+        self._suffixes = array("Q", sorted(set(suffixes)))
+
+    @classmethod
+    def from_file(cls, path: str) -> "DomainIndex":
+        with open(path, encoding="utf-8") as f:
+            index = cls(f)
+        logger.info(f"[Prefilter] Loaded {len(index)} domains from {path}")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._exact) + len(self._suffixes)
+
+    @staticmethod
+    def _contains(table: array, value: int) -> bool:
+        i = bisect_left(table, value)
+        return i < len(table) and table[i] == value
+
+    def match(self, host: str) -> bool:
+        host = normalize_host(host)
+        if host.startswith("www."):
+            host = host[4:]
+        if self._contains(self._exact, _domain_hash(host)):
+            return True
+        labels = host.split(".")
+        return any(
+            self._contains(self._suffixes, _domain_hash(".".join(labels[i:])))
+            for i in range(len(labels) - 1)
+        )
+
+
+class PrefilterDecision(NamedTuple):
+    tier: str
+    verdict: HarmfulCheckerConfig
+
+
+def _skeleton(label: str) -> str:
+    return label.translate(CONFUSABLES).replace("rn", "m").replace("vv", "w").replace("-", "")
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class Prefilter:
+    """
+    Cheap local checks run before scraping and before the LLM.
+
+    Only the allow/deny lists decide a check. The denylist is applied to the
+    submitted URL before anything is fetched (``check_url``); both lists are
+    applied to the URL the page ended up on after redirects
+    (``check_final_url``), so an allowed host cannot vouch for wherever it
+    redirects to. Lookalike domains and keyword hits misfire on legitimate
+    pages (googly.com, news about a gambling crackdown), so ``signals`` only
+    reports them for the LLM to weigh alongside the page itself.
+    """
+
+    def __init__(
+        self,
+        allowlist: Optional[DomainIndex] = None,
+        denylist: Optional[DomainIndex] = None,
+        brands: Iterable[str] = DEFAULT_BRANDS,
+        keyword_rules: Iterable[tuple] = DEFAULT_KEYWORD_RULES,
+        signal_score: float = PREFILTER_SIGNAL_SCORE,
+    ):
+        self.allowlist = allowlist if allowlist is not None else DomainIndex(DEFAULT_ALLOWLIST)
+        self.denylist = denylist if denylist is not None else DomainIndex()
+        self.brands = {registrable_domain(brand): registrable_domain(brand).split(".")[0] for brand in brands}
+        self.keyword_rules = [(re.compile(pattern, re.IGNORECASE), weight, category) for pattern, weight, category in keyword_rules]
+        self.signal_score = signal_score
+
+    @classmethod
+    def from_env(cls) -> "Prefilter":
+        allowlist = DomainIndex(DEFAULT_ALLOWLIST)
+        if PREFILTER_ALLOWLIST:
+            allowlist = DomainIndex.from_file(PREFILTER_ALLOWLIST)
+        denylist = DomainIndex.from_file(PREFILTER_DENYLIST) if PREFILTER_DENYLIST else DomainIndex()
+        return cls(allowlist=allowlist, denylist=denylist)
+
+    def check_url(self, url: str) -> Optional[PrefilterDecision]:
+        """
+        :param url: URL as submitted, before navigation
+        :return: A denylist decision, or None
+        """
+        host = urlsplit(url).hostname or ""
+        if self.denylist.match(host):
+            return PrefilterDecision("denylist", HarmfulCheckerConfig(
+                is_harmful=True, summary_harmful=f"{host} is on the list of known harmful domains."))
+        return None
+
+    def check_final_url(self, url: str) -> Optional[PrefilterDecision]:
+        """
+        :param url: URL of the page after navigation and redirects
+        :return: A denylist or allowlist decision, or None
+        """
+        decision = self.check_url(url)
+        if decision is not None:
+            return decision
+        host = urlsplit(url).hostname or ""
+        if self.allowlist.match(host):
+            return PrefilterDecision("allowlist", HarmfulCheckerConfig(
+                is_harmful=False, summary_harmful=f"{host} is on the list of known safe domains."))
+        return None
+
+    def lookalike_of(self, host: str) -> Optional[str]:
+        """
+        :param host: Hostname to inspect
+        :return: The imitated brand domain, or None
+        """
+        domain = registrable_domain(host)
+        if domain in self.brands:
+            return None
+        label = domain.split(".")[0]
+        if label.startswith("xn--"):
+            try:
+                label = label.encode("ascii").decode("idna")
+            except UnicodeError:
+                pass
+        tokens = set(label.split("-"))
+        skeleton = _skeleton(label)
+        for brand, brand_label in self.brands.items():
+            if label == brand_label:
+                continue  # same name under another TLD is usually the brand's own ccTLD
+            if brand_label in tokens and tokens & COMBOSQUAT_WORDS:
+                return brand  # combosquatting: paypal-login.com
+            if skeleton == _skeleton(brand_label):
+                return brand  # paypa1.com, rnicrosoft.com
+            if len(brand_label) >= 6 and _within_one_edit(label, brand_label):
+                return brand  # typosquatting: gooogle.com
+        return None
+
+    def score_text(self, text: str) -> tuple[float, Counter]:
+        """
+        :param text: Visible text of the page
+        :return: Total score and the score per category
+        """
+        categories = Counter()
+        for pattern, weight, category in self.keyword_rules:
+            if pattern.search(text):
+                categories[category] += weight
+        return sum(categories.values()), categories
+
+    def signals(self, url: str, text: str) -> list[str]:
+        """
+        :param url: URL of the page
+        :param text: Visible text of the page
+        :return: Notes on what looks suspicious, for the LLM prompt; empty when nothing does
+        """
+        notes = []
+        host = urlsplit(url).hostname or ""
+        brand = self.lookalike_of(host)
+        if brand is not None:
+            notes.append(f"The domain {host} resembles {brand}; check whether the page impersonates it.")
+        score, categories = self.score_text(text)
+        if score >= self.signal_score:
+            category = categories.most_common(1)[0][0]
+            notes.append(f"The text uses many terms associated with {category}; check whether the page promotes it or only reports on it.")
+        return notes
@@ -0,0 +1,360 @@
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from os import getenv
+from typing import AsyncIterator, Callable, Optional
+from dotenv import load_dotenv
+from logging_config import logger
+from schemas.checkSchemas import HarmfulCheckerConfig
+from utils.errors import CheckUnavailable, ClassificationFailed
+from utils.urls import normalize_url
+
+load_dotenv(override=True)
+
+# Configurations
+SCRAPER_IPC_ADDRESS = getenv("SCRAPER_IPC_ADDRESS", "127.0.0.1:0")  # host:port of the check queue, 0 picks a free port
+SCRAPER_IPC_AUTHKEY = getenv("SCRAPER_IPC_AUTHKEY", "")
+SCRAPER_QUEUE_SIZE = int(getenv("SCRAPER_QUEUE_SIZE", "256"))  # checks allowed to wait for a scraper
+SCRAPER_SUBMIT_TIMEOUT = float(getenv("SCRAPER_SUBMIT_TIMEOUT", "5"))  # seconds to wait for room in the queue
+SCRAPER_REPLY_TIMEOUT = float(getenv("SCRAPER_REPLY_TIMEOUT", "180"))  # seconds a check may take end to end
+SCRAPER_BATCH_CONCURRENCY = int(getenv("BATCH_SCRAPE_CONCURRENCY", "4"))  # same setting as the local checker's batch scrapes
+
+# Checks cross the process boundary as (job_id, reply_to, url, bypass_cache, user_id, stream).
+# Replies are (job_id, kind, payload): "started" with the scraper's name, then
+# "event" with a stage event (streamed checks only), and last "result" with the
+# verdict or "error" with (kind, message, retry_after).
+
+
+class ScraperUnavailable(CheckUnavailable):
+    """Raised when no scraper process took or answered a check in time."""
+
+
+class ScraperThrottled(ScraperUnavailable):
+    """A scraper's LLM or browser pool was out of capacity, as reported back over the queue."""
+
+    throttled = True
+
+
+_ERROR_TYPES = {"throttled": ScraperThrottled, "unavailable": ScraperUnavailable}
+
+
+class CheckQueueManager(BaseManager):
+    """
+    Client side of the queues served by ``deploy.py``.
+
+    ``checks()`` is the one queue every scraper process takes work from;
+    ``reply_queues()`` holds the queue of each API worker, which scrapers
+    ``put(name, message)`` results on and worker ``name`` takes them from
+    with ``get(name, timeout)``; ``cancels(name)`` is the queue scraper
+    ``name`` takes cancellations from.
+    """
+
+
+CheckQueueManager.register("checks")
+CheckQueueManager.register("reply_queues")
+CheckQueueManager.register("cancels")
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def encode_error(error: BaseException) -> tuple[str, str, Optional[float]]:
+    if isinstance(error, CheckUnavailable):
+        return "throttled" if error.throttled else "unavailable", str(error), error.retry_after
+    if isinstance(error, ClassificationFailed):
+        return "failed", str(error), None
+    return "error", str(error), None
+
+
+def decode_error(error: tuple[str, str, Optional[float]]) -> Exception:
+    kind, message, retry_after = error
+    if kind in _ERROR_TYPES:
+        return _ERROR_TYPES[kind](message, retry_after)
+    if kind == "failed":
+        return ClassificationFailed(message)
+    return RuntimeError(message)
+
+
+class RemoteHarmfulChecker:
+    """
+    Stands in for ``HarmfulChecker`` in API workers started by ``deploy.py``.
+
+    Checks are put on the shared queue and run by whichever scraper process
+    has a free slot, so browsers and LLM calls never share a process (or a
+    GIL) with request handling. A reader thread hands replies back to the
+    event loop that called ``start``. A check given up on before its result
+    came (timed out, or its stream closed) is cancelled on the scraper.
+    """
+
+    def __init__(
+        self,
+        address: str = SCRAPER_IPC_ADDRESS,
+        authkey: str = SCRAPER_IPC_AUTHKEY,
+        batch_concurrency: int = SCRAPER_BATCH_CONCURRENCY,
+        submit_timeout: float = SCRAPER_SUBMIT_TIMEOUT,
+        reply_timeout: float = SCRAPER_REPLY_TIMEOUT,
+    ):
+        self.address = address
+        self.authkey = authkey
+        self.batch_concurrency = batch_concurrency
+        self.submit_timeout = submit_timeout
+        self.reply_timeout = reply_timeout
+        self.name = f"api-{os.getpid()}"
+        self._manager: Optional[CheckQueueManager] = None
+        self._checks = None
+        self._reply_queues = None
+        self._connecting = asyncio.Lock()
+        self._submitter: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._streams: dict[int, Callable[[dict], None]] = {}
+        self._owners: dict[int, str] = {}  # scraper running each pending check
+        self._ids = itertools.count()
+        self._stopping = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+        self.submitted = 0
+        self.timeouts = 0
+        self.disconnects = 0
+        self.cancelled = 0
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "timeouts": self.timeouts,
+            "disconnects": self.disconnects,
+            "cancelled": self.cancelled,
+        }
+
+    async def start(self) -> None:
+        """
+        Connect to the queue; call from the event loop that will await checks. Safe to call
+        repeatedly: after the connection was lost, the next call connects again.
+
+        :raises ScraperUnavailable: If the queue cannot be reached
+        """
+        if self._reader is not None:
+            return
+        async with self._connecting:
+            if self._reader is not None:
+                return
+            self._loop = asyncio.get_running_loop()
+            # Manager proxies keep one connection per thread and address, and never drop a broken one:
+            # every connection gets fresh threads to connect and put checks from
+            submitter = ThreadPoolExecutor(thread_name_prefix="check-submit")
+            try:
+                manager, checks, reply_queues = await self._loop.run_in_executor(submitter, self._connect)
+            except OSError as e:
+                submitter.shutdown(wait=False)
+                raise ScraperUnavailable(f"Check queue at {self.address} unreachable: {e}", retry_after=self.submit_timeout)
+            self._manager, self._checks, self._reply_queues, self._submitter = manager, checks, reply_queues, submitter
+            self._reader = threading.Thread(target=self._read_replies, args=(reply_queues,), name="check-replies", daemon=True)
+            self._reader.start()
+            logger.info(f"[RemoteHarmfulChecker] {self.name} connected to scrapers at {self.address}")
+
+    def _connect(self) -> tuple:
+        manager = CheckQueueManager(parse_address(self.address), authkey=self.authkey.encode())
+        manager.connect()
+        reply_queues = manager.reply_queues()
+        # Before the first check goes out: replies to a worker without a queue are dropped
+        reply_queues.open(self.name)
+        return manager, manager.checks(), reply_queues
+
+    def close(self) -> None:
+        """Stop reading replies and remove this worker's reply queue; checks still waiting fail with ``ScraperUnavailable``."""
+        self._stopping.set()
+        if self._reader is not None:
+            self._reader.join()
+        if self._submitter is not None:
+            try:
+                self._submitter.submit(self._reply_queues.close, self.name).result(timeout=self.submit_timeout)
+            except Exception as e:
+                # The server drops it anyway once nobody has read it for a while
+                logger.error(f"[RemoteHarmfulChecker] Failed to remove the reply queue of {self.name}: {e!r}")
+            self._submitter.shutdown(wait=False)
+        for future in list(self._pending.values()):
+            self._loop.call_soon_threadsafe(self._resolve_error, future, ScraperUnavailable("Checker is shutting down"))
+
+    async def aharmful_checker(self, url, bypass_cache: bool = False, user_id: Optional[str] = None) -> Optional[HarmfulCheckerConfig]:
+        """
+        Same contract as ``HarmfulChecker.aharmful_checker``.
+
+        :raises ScraperUnavailable: If the queue is full or no reply came in time
+        """
+        return await self._run(url, bypass_cache, user_id)
+
+    async def _run(
+        self, url, bypass_cache: bool, user_id: Optional[str], on_event: Optional[Callable[[dict], None]] = None,
+    ) -> Optional[HarmfulCheckerConfig]:
+        await self.start()
+        job_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[job_id] = future
+        if on_event is not None:
+            self._streams[job_id] = on_event
+        try:
+            try:
+                await self._loop.run_in_executor(
+                    self._submitter, self._checks.put,
+                    (job_id, self.name, url, bypass_cache, user_id, on_event is not None), True, self.submit_timeout,
+                )
+            except queue.Full:
+                raise ScraperUnavailable("Too many checks waiting for a scraper", retry_after=self.submit_timeout)
+            except (EOFError, OSError) as e:
+                self._pending.pop(job_id, None)
+                self._disconnected(self._reader, e)
+                raise ScraperUnavailable("Lost the check queue", retry_after=self.submit_timeout)
+            self.submitted += 1
+            try:
+                return await asyncio.wait_for(future, timeout=self.reply_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise ScraperUnavailable(f"No result from the scrapers after {self.reply_timeout}s")
+        finally:
+            self._pending.pop(job_id, None)
+            self._streams.pop(job_id, None)
+            owner = self._owners.pop(job_id, None)
+            if owner is not None:
+                # Still running on a scraper, for nobody
+                self._cancel(owner, job_id)
+
+    async def astream_check(
+        self, url, bypass_cache: bool = False, user_id: Optional[str] = None, heartbeat: Optional[float] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Same contract as ``HarmfulChecker.astream_check``: the scraper sends each stage
+        event back over the reply queue, and closing the iterator early cancels the check
+        on the scraper. ``elapsed_ms`` counts from the call, including time in the queue.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+
+        def emit(event: dict) -> None:
+            event["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+            events.put_nowait(event)
+
+        check = asyncio.ensure_future(self._run(url, bypass_cache, user_id, on_event=emit))
+        check.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield {"event": "heartbeat"}
+                    continue
+                if event is None:
+                    break
+                yield event
+            yield {"event": "result", "result": check.result(), "elapsed_ms": round((time.perf_counter() - started) * 1000)}
+        finally:
+            check.cancel()
+
+    async def abatch_check(
+        self, urls: list[str], bypass_cache: bool = False, limits=None, user_id: Optional[str] = None,
+    ) -> AsyncIterator[tuple[str, Optional[HarmfulCheckerConfig], Optional[Exception]]]:
+        """
+        Same contract as ``HarmfulChecker.abatch_check``. ``limits`` is ignored:
+        at most ``batch_concurrency`` checks of one batch are queued at a time,
+        so a large batch cannot crowd single checks out of the queue.
+        """
+        unique = {}
+        for url in urls:
+            unique.setdefault(normalize_url(url), url)
+        slots = asyncio.Semaphore(self.batch_concurrency)
+
+        async def run(url):
+            async with slots:
+                try:
+                    return url, await self.aharmful_checker(url, bypass_cache, user_id), None
+                except Exception as e:
+                    logger.error(f"[RemoteHarmfulChecker] Batch check failed for {url}: {e}")
+                    return url, None, e
+
+        tasks = [asyncio.ensure_future(run(url)) for url in unique.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _read_replies(self, reply_queues) -> None:
+        # Stops once closed, or once this connection was dropped in favour of a new one
+        while not self._stopping.is_set() and self._reader is threading.current_thread():
+            try:
+                job_id, kind, payload = reply_queues.get(self.name, 1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError) as e:
+                self._loop.call_soon_threadsafe(self._disconnected, threading.current_thread(), e)
+                return
+            self._loop.call_soon_threadsafe(self._on_reply, job_id, kind, payload)
+
+    def _disconnected(self, reader: Optional[threading.Thread], error: BaseException) -> None:
+        """Drop the connection ``reader`` belongs to, so the next check reconnects; replies still owed are lost."""
+        if reader is None or reader is not self._reader:
+            return  # Already handled, or a newer connection
+        logger.error(f"[RemoteHarmfulChecker] Lost the check queue, reconnecting on the next check: {error!r}")
+        self.disconnects += 1
+        self._submitter.shutdown(wait=False)
+        self._reader = self._manager = self._checks = self._reply_queues = self._submitter = None
+        # The scrapers' replies for these are lost with the connection: nothing left to cancel
+        self._owners.clear()
+        for future in list(self._pending.values()):
+            self._resolve_error(future, ScraperUnavailable("Lost the check queue", retry_after=self.submit_timeout))
+
+    def _on_reply(self, job_id: int, kind: str, payload) -> None:
+        if kind == "started":
+            if job_id in self._pending:
+                self._owners[job_id] = payload
+            else:
+                # The caller gave up while the check waited in the queue
+                self._cancel(payload, job_id)
+        elif kind == "event":
+            on_event = self._streams.get(job_id)
+            if on_event is not None:
+                on_event(payload)
+        else:
+            self._owners.pop(job_id, None)
+            self._resolve(job_id, kind, payload)
+
+    def _resolve(self, job_id: int, kind: str, payload) -> None:
+        future = self._pending.get(job_id)
+        if future is None or future.done():
+            # The caller timed out or went away
+            return
+        if kind == "error":
+            future.set_exception(decode_error(payload))
+        else:
+            future.set_result(HarmfulCheckerConfig(**payload) if payload is not None else None)
+
+    def _cancel(self, scraper: str, job_id: int) -> None:
+        """Ask ``scraper`` to drop check ``job_id``; best effort, since it may finish first."""
+        manager, submitter = self._manager, self._submitter
+        if manager is None:
+            return
+
+        def put() -> None:
+            manager.cancels(scraper).put((self.name, job_id))
+
+        def done(future) -> None:
+            if future.exception() is not None:
+                logger.error(f"[RemoteHarmfulChecker] Failed to cancel check {job_id} on {scraper}: {future.exception()!r}")
+
+        try:
+            submitter.submit(put).add_done_callback(done)
+        except RuntimeError:
+            return  # shutting down
+        self.cancelled += 1
+
+    @staticmethod
+    def _resolve_error(future: asyncio.Future, error: Exception) -> None:
+        if not future.done():
+            future.set_exception(error)
@@ -0,0 +1,297 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from os import getenv
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import logger
+from schemas.checkSchemas import HarmfulCheckerConfig
+from utils.fingerprint import Fingerprint, to_signed, to_unsigned
+
+load_dotenv(override=True)
+
+# Configurations
+SCAN_HISTORY_ENABLED = getenv("SCAN_HISTORY_ENABLED", "true").lower() == "true"
+SCAN_HISTORY_BATCH_SIZE = int(getenv("SCAN_HISTORY_BATCH_SIZE", "100"))
+SCAN_HISTORY_FLUSH_INTERVAL = float(getenv("SCAN_HISTORY_FLUSH_INTERVAL", "2"))  # seconds a scan may wait in the buffer
+SCAN_HISTORY_MAX_BUFFER = int(getenv("SCAN_HISTORY_MAX_BUFFER", "10000"))  # oldest scans are dropped beyond this
+REPUTATION_ENABLED = getenv("REPUTATION_ENABLED", "true").lower() == "true"
+REPUTATION_MIN_SCANS = int(getenv("REPUTATION_MIN_SCANS", "5"))
+REPUTATION_HARMFUL_RATIO = float(getenv("REPUTATION_HARMFUL_RATIO", "0.8"))
+REPUTATION_CACHE_TTL = int(getenv("REPUTATION_CACHE_TTL", "600"))  # seconds a domain's rollup is trusted in memory
+REPUTATION_CACHE_SIZE = int(getenv("REPUTATION_CACHE_SIZE", "10000"))  # domains kept in memory
+REPUTATION_READ_TIMEOUT = float(getenv("REPUTATION_READ_TIMEOUT", "1"))  # seconds a check waits for a domain's rollup
+REPUTATION_READ_BACKOFF = float(getenv("REPUTATION_READ_BACKOFF", "30"))  # seconds without reads after one failed
+REPUTATION_READ_WORKERS = int(getenv("REPUTATION_READ_WORKERS", "2"))
+REPUTATION_SAMPLE_RATE = float(getenv("REPUTATION_SAMPLE_RATE", "0.1"))  # share of checks fully re-checked despite a bad reputation
+
+# Tiers that judged the page content. Verdicts from URL lists, copied from
+# another page or from the reputation itself must not feed the reputation.
+CONTENT_TIERS = {"llm"}
+
+# Reads get their own threads: a stalled database must not hold up the
+# default executor, which also prepares screenshots
+_reputation_executor = ThreadPoolExecutor(max_workers=REPUTATION_READ_WORKERS, thread_name_prefix="reputation")
+
+
+class _Reputation:
+    __slots__ = ("scans", "harmful", "summary", "last_harmful", "loaded_at")
+
+    def __init__(self, scans: int = 0, harmful: int = 0, summary: Optional[str] = None, last_harmful: bool = False):
+        self.scans = scans
+        self.harmful = harmful
+        self.summary = summary
+        self.last_harmful = last_harmful  # whether the latest content verdict was harmful
+        self.loaded_at = time.monotonic()
+
+
+class ScanHistory:
+    """
+    Keeps every content verdict in ``scan_results`` and a per-domain rollup in
+    ``domain_reputation``.
+
+    ``record`` only appends to a buffer; the buffer is written in one
+    transaction once it holds ``batch_size`` scans or ``flush_interval``
+    seconds after the first one, so persistence never delays a check.
+    ``reputation_verdict`` answers from an in-memory LRU copy of the rollup
+    that is refreshed from the database every ``REPUTATION_CACHE_TTL``
+    seconds. A read waits at most ``REPUTATION_READ_TIMEOUT`` seconds, and
+    after a failed one the database is left alone for
+    ``REPUTATION_READ_BACKOFF`` seconds, so an unreachable database costs
+    the checks nothing but the missing shortcut.
+
+    Not thread-safe: only use it from the checker loop.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = SCAN_HISTORY_BATCH_SIZE,
+        flush_interval: float = SCAN_HISTORY_FLUSH_INTERVAL,
+        max_buffer: int = SCAN_HISTORY_MAX_BUFFER,
+        reputation_enabled: bool = REPUTATION_ENABLED,
+        reputation_size: int = REPUTATION_CACHE_SIZE,
+        read_timeout: float = REPUTATION_READ_TIMEOUT,
+        read_backoff: float = REPUTATION_READ_BACKOFF,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.reputation_enabled = reputation_enabled
+        self.reputation_size = reputation_size
+        self.read_timeout = read_timeout
+        self.read_backoff = read_backoff
+        self._buffer: list[dict] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._writes: set[asyncio.Task] = set()
+        self._reputation: OrderedDict[str, _Reputation] = OrderedDict()
+        self._reads_paused_until = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.sampled = 0
+        self.read_failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "domains": len(self._reputation),
+            "reputation_sampled": self.sampled,
+            "reputation_read_failures": self.read_failures,
+        }
+
+    def record(
+        self,
+        url: str,
+        url_key: str,
+        domain: str,
+        verdict: HarmfulCheckerConfig,
+        tier: str,
+        user_id: Optional[str] = None,
+        model: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        perceptual_hash: Optional[int] = None,
+        timings: Optional[dict] = None,
+    ) -> None:
+        """Queue a scan for writing; returns immediately."""
+        self._buffer.append({
+            "url": url,
+            "url_key": url_key,
+            "domain": domain,
+            "is_harmful": verdict.is_harmful,
+            "summary_harmful": verdict.summary_harmful,
+            "tier": tier,
+            "model": model,
+            "content_hash": content_hash,
+            "perceptual_hash": to_signed(perceptual_hash) if perceptual_hash is not None else None,
+            "timings": timings,
+            "user_id": user_id,
+            "created_at": datetime.utcnow(),
+        })
+        if len(self._buffer) > self.max_buffer:
+            # The database is not keeping up; keep the newest scans
+            overflow = len(self._buffer) - self.max_buffer
+            del self._buffer[:overflow]
+            self.dropped += overflow
+        if tier in CONTENT_TIERS:
+            reputation = self._reputation.get(domain)
+            if reputation is not None:
+                reputation.scans += 1
+                reputation.harmful += verdict.is_harmful
+                reputation.last_harmful = verdict.is_harmful
+                if verdict.is_harmful:
+                    reputation.summary = verdict.summary_harmful
+
+        if len(self._buffer) >= self.batch_size:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    async def flush(self) -> None:
+        """Write everything buffered and wait for writes in progress, e.g. before shutdown."""
+        self._start_flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def reputation_verdict(self, domain: str) -> Optional[HarmfulCheckerConfig]:
+        """
+        :param domain: Site key (``utils.urls.site_key``) of the page about to be scraped
+        :return: A harmful verdict if enough of the site's scans were harmful, else None.
+                 A clean record never yields a verdict: any site can start hosting a bad page.
+                 Nor does a benign latest scan, and ``REPUTATION_SAMPLE_RATE`` of the checks
+                 get None anyway, so a cleaned-up site is scanned again and recovers.
+        """
+        if not self.reputation_enabled or not domain:
+            return None
+        reputation = self._reputation.get(domain)
+        if reputation is None or time.monotonic() - reputation.loaded_at > REPUTATION_CACHE_TTL:
+            if time.monotonic() < self._reads_paused_until:
+                return None
+            try:
+                reputation = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(_reputation_executor, self._db_reputation, domain),
+                    self.read_timeout,
+                )
+            except Exception as e:
+                self.read_failures += 1
+                self._reads_paused_until = time.monotonic() + self.read_backoff
+                logger.error(
+                    f"[ScanHistory] Failed to read reputation of {domain}: {e!r}; "
+                    f"skipping reputation for {self.read_backoff:g}s"
+                )
+                return None
+            self._reputation[domain] = reputation
+            if len(self._reputation) > self.reputation_size:
+                self._reputation.popitem(last=False)
+        self._reputation.move_to_end(domain)
+        if reputation.scans < REPUTATION_MIN_SCANS or reputation.harmful < reputation.scans * REPUTATION_HARMFUL_RATIO:
+            return None
+        if not reputation.last_harmful:
+            return None
+        if random.random() < REPUTATION_SAMPLE_RATE:
+            self.sampled += 1
+            return None
+        return HarmfulCheckerConfig(
+            is_harmful=True,
+            summary_harmful=(
+                f"{reputation.harmful} of {reputation.scans} pages checked on {domain} were harmful"
+                + (f", most recently: {reputation.summary}" if reputation.summary else ".")
+            ),
+        )
+
+    def recent_fingerprints(self, limit: int) -> list[tuple[Fingerprint, HarmfulCheckerConfig]]:
+        """
+        Fingerprints of the latest pages the LLM classified, oldest first, to warm a ``FingerprintIndex``.
+        Blocking; run it off the loop.
+        """
+        from database.connection import SessionLocal
+        from database.models import ScanResult
+
+        with SessionLocal() as db:
+            rows = (
+                db.query(ScanResult)
+                .filter(ScanResult.tier == "llm")
+                .order_by(ScanResult.created_at.desc())
+                .limit(limit)
+                .all()
+            )
+            return [
+                (
+                    Fingerprint(row.content_hash, to_unsigned(row.perceptual_hash) if row.perceptual_hash is not None else None, row.domain),
+                    HarmfulCheckerConfig(is_harmful=row.is_harmful, summary_harmful=row.summary_harmful),
+                )
+                for row in reversed(rows)
+            ]
+
+    def _start_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        task = asyncio.ensure_future(asyncio.to_thread(self._db_write, rows))
+        self._writes.add(task)
+        task.add_done_callback(lambda task: self._on_write_done(task, len(rows)))
+
+    def _on_write_done(self, task: asyncio.Task, count: int) -> None:
+        self._writes.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            self.failed += count
+            logger.error(f"[ScanHistory] Failed to write {count} scan(s): {None if task.cancelled() else task.exception()}")
+        else:
+            self.written += count
+
+    def _db_reputation(self, domain: str) -> _Reputation:
+        from database.connection import SessionLocal
+        from database.models import DomainReputation
+
+        with SessionLocal() as db:
+            row = db.get(DomainReputation, domain)
+            if row is None:
+                return _Reputation()
+            last_harmful = row.last_harmful_at is not None and row.last_harmful_at >= row.last_scanned_at
+            return _Reputation(row.scans, row.harmful, row.last_harmful_summary, last_harmful)
+
+    def _db_write(self, rows: list[dict]) -> None:
+        from sqlalchemy import func, insert as plain_insert
+        from sqlalchemy.dialects.postgresql import insert
+        from database.connection import SessionLocal
+        from database.models import DomainReputation, ScanResult
+
+        rollup: dict[str, dict] = {}
+        for row in rows:
+            if row["tier"] not in CONTENT_TIERS:
+                continue
+            domain = rollup.setdefault(row["domain"], {
+                "domain": row["domain"], "scans": 0, "harmful": 0,
+                "last_harmful_summary": None, "last_scanned_at": row["created_at"], "last_harmful_at": None,
+            })
+            domain["scans"] += 1
+            domain["last_scanned_at"] = row["created_at"]
+            if row["is_harmful"]:
+                domain["harmful"] += 1
+                domain["last_harmful_summary"] = row["summary_harmful"]
+                domain["last_harmful_at"] = row["created_at"]
+
+        with SessionLocal() as db:
+            db.execute(plain_insert(ScanResult), rows)
+            if rollup:
+                statement = insert(DomainReputation).values(list(rollup.values()))
+                excluded = statement.excluded
+                db.execute(statement.on_conflict_do_update(
+                    index_elements=[DomainReputation.domain],
+                    set_={
+                        "scans": DomainReputation.scans + excluded.scans,
+                        "harmful": DomainReputation.harmful + excluded.harmful,
+                        "last_scanned_at": excluded.last_scanned_at,
+                        "last_harmful_summary": func.coalesce(excluded.last_harmful_summary, DomainReputation.last_harmful_summary),
+                        "last_harmful_at": func.coalesce(excluded.last_harmful_at, DomainReputation.last_harmful_at),
+                    },
+                ))
+            db.commit()
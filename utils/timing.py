@@ -0,0 +1,38 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from utils import metrics
+
+
+class StageTimer:
+    """
+    Collects how long each stage of one check took, in milliseconds, and feeds the stage metrics.
+
+    ``on_stage(name, phase)`` is called with phase "started" when a stage
+    begins and "finished" when it completes without raising.
+    """
+
+    def __init__(self, on_stage: Optional[Callable[[str, str], None]] = None):
+        self.timings: dict[str, int] = {}
+        self.on_stage = on_stage
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.on_stage is not None:
+            self.on_stage(name, "started")
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = round(elapsed * 1000)
+            metrics.observe_stage(name, elapsed, failed)
+        if self.on_stage is not None:
+            self.on_stage(name, "finished")
+
+    def __str__(self) -> str:
+        return " ".join(f"{name}={ms}ms" for name, ms in self.timings.items())
@@ -0,0 +1,99 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid",
+    "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok",
+    "ref_src", "si", "spm", "vero_id",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Second-level labels under which registrations happen one level deeper
+# (example.co.id, example.com.au). Not the full public suffix list, but covers
+# the ccTLDs our traffic comes from.
+MULTI_LABEL_SUFFIX_PARENTS = {"ac", "co", "com", "edu", "go", "gov", "mil", "net", "or", "org", "sch", "web", "my", "biz", "ne"}
+
+# Hosts whose pages belong to different owners by path, with the number of
+# leading path segments that name the owner (sites.google.com/view/<site>)
+PATH_SCOPED_HOSTS = {"sites.google.com": 2, "github.com": 1, "gitlab.com": 1, "medium.com": 1}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_host(host: str) -> str:
+    host = host.strip().rstrip(".").lower()
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return host
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that trivially different spellings share one key.
+
+    Lowercases scheme and host, drops default ports, the fragment and tracking
+    query parameters, and sorts the remaining query parameters.
+
+    :param url: URL as submitted by the client
+    :return: Normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = normalize_host(parts.hostname or "")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = parts.path or "/"
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(key)
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def registrable_domain(host: str) -> str:
+    """
+    Approximate the registrable domain of a host (``a.b.example.co.id`` -> ``example.co.id``).
+
+    :param host: Hostname, with or without port
+    :return: Registrable domain, or the host itself for IPs and single labels
+    """
+    host = normalize_host(host.split(":")[0])
+    labels = host.split(".")
+    if len(labels) <= 2 or labels[-1].isdigit():
+        return host
+    if len(labels[-1]) == 2 and labels[-2] in MULTI_LABEL_SUFFIX_PARENTS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def site_key(url: str) -> str:
+    """
+    Key of the site a page belongs to, for per-site history such as domain reputation.
+
+    This is the host without ``www.``, not the registrable domain: on shared
+    hosts (github.io, blogspot.com, vercel.app) every subdomain has its own
+    owner. On ``PATH_SCOPED_HOSTS`` the owner's leading path segments are kept.
+
+    :param url: Normalized URL
+    :return: Site key, e.g. ``foo.github.io`` or ``sites.google.com/view/foo``
+    """
+    parts = urlsplit(url)
+    host = normalize_host(parts.hostname or "")
+    if host.startswith("www."):
+        host = host[4:]
+    segments = PATH_SCOPED_HOSTS.get(host)
+    if segments:
+        owner = [segment for segment in parts.path.split("/") if segment][:segments]
+        if owner:
+            return "/".join([host, *owner])
+    return host
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from os import getenv
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import logger
+from schemas.checkSchemas import HarmfulCheckerConfig
+
+load_dotenv(override=True)
+
+# Configurations
+VERDICT_CACHE_SIZE = int(getenv("VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_TTL_HARMFUL = int(getenv("VERDICT_CACHE_TTL_HARMFUL", "86400"))  # 24 hours
+VERDICT_CACHE_TTL_BENIGN = int(getenv("VERDICT_CACHE_TTL_BENIGN", "21600"))  # 6 hours
+VERDICT_CACHE_DB = getenv("VERDICT_CACHE_DB", "false").lower() == "true"
+
+
+class VerdictCache:
+    """
+    Two-tier cache of verdicts keyed by normalized URL.
+
+    The first tier is an in-process LRU, the optional second tier is the
+    ``verdict_cache`` table in Postgres so verdicts survive restarts and are
+    shared between workers. Harmful verdicts are kept longer than benign ones,
+    since a benign page is the one more likely to turn malicious later.
+
+    Not thread-safe: only use it from the checker loop.
+    """
+
+    def __init__(
+        self,
+        max_size: int = VERDICT_CACHE_SIZE,
+        ttl_harmful: int = VERDICT_CACHE_TTL_HARMFUL,
+        ttl_benign: int = VERDICT_CACHE_TTL_BENIGN,
+        use_db: bool = VERDICT_CACHE_DB,
+    ):
+        self.max_size = max_size
+        self.ttl_harmful = ttl_harmful
+        self.ttl_benign = ttl_benign
+        self.use_db = use_db
+        self._entries: OrderedDict[str, tuple[float, HarmfulCheckerConfig]] = OrderedDict()
+        self._pending_writes: set[asyncio.Task] = set()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def ttl_for(self, verdict: HarmfulCheckerConfig) -> int:
+        return self.ttl_harmful if verdict.is_harmful else self.ttl_benign
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "db_hits": self.db_hits, "misses": self.misses}
+
+    async def get(self, url_key: str) -> Optional[HarmfulCheckerConfig]:
+        """
+        Look up a verdict.
+
+        :param url_key: Normalized URL
+        :return: Cached verdict, or None on a miss or an expired entry
+        """
+        entry = self._entries.get(url_key)
+        if entry is not None:
+            expires_at, verdict = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(url_key)
+                self.hits += 1
+                return verdict
+            del self._entries[url_key]
+
+        if self.use_db:
+            try:
+                row = await asyncio.to_thread(self._db_get, url_key)
+            except Exception as e:
+                logger.error(f"[VerdictCache] Failed to read {url_key} from database: {e}")
+                row = None
+            if row is not None:
+                verdict, remaining = row
+                self._remember(url_key, verdict, remaining)
+                self.db_hits += 1
+                return verdict
+
+        self.misses += 1
+        return None
+
+    async def set(self, url_key: str, verdict: HarmfulCheckerConfig) -> None:
+        """
+        Store a verdict in both tiers. The database write happens in the background.
+
+        :param url_key: Normalized URL
+        :param verdict: Verdict to cache
+        """
+        ttl = self.ttl_for(verdict)
+        self._remember(url_key, verdict, ttl)
+        if self.use_db:
+            task = asyncio.ensure_future(asyncio.to_thread(self._db_set, url_key, verdict, ttl))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._on_write_done)
+
+    def _remember(self, url_key: str, verdict: HarmfulCheckerConfig, ttl: float) -> None:
+        self._entries[url_key] = (time.monotonic() + ttl, verdict)
+        self._entries.move_to_end(url_key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _on_write_done(self, task: asyncio.Task) -> None:
+        self._pending_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[VerdictCache] Failed to write verdict to database: {task.exception()}")
+
+    def _db_get(self, url_key: str) -> Optional[tuple[HarmfulCheckerConfig, float]]:
+        from database.connection import SessionLocal
+        from database.models import CachedVerdict
+
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            row = db.query(CachedVerdict).filter(
+                CachedVerdict.url_key == url_key,
+                CachedVerdict.expires_at > now,
+            ).first()
+            if row is None:
+                return None
+            verdict = HarmfulCheckerConfig(is_harmful=row.is_harmful, summary_harmful=row.summary_harmful)
+            return verdict, (row.expires_at - now).total_seconds()
+
+    def _db_set(self, url_key: str, verdict: HarmfulCheckerConfig, ttl: int) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from database.connection import SessionLocal
+        from database.models import CachedVerdict
+
+        values = {
+            "url_key": url_key,
+            "is_harmful": verdict.is_harmful,
+            "summary_harmful": verdict.summary_harmful,
+            "created_at": datetime.utcnow(),
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+        }
+        statement = insert(CachedVerdict).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[CachedVerdict.url_key],
+            set_={key: value for key, value in values.items() if key != "url_key"},
+        )
+        with SessionLocal() as db:
+            db.execute(statement)
+            db.commit()
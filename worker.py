@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import signal
+from os import getenv
+from typing import Optional
+from dotenv import load_dotenv
+from database.connection import AsyncSessionLocal, async_engine
+from database.models import CheckJob
+from logging_config import logger
+from schemas.checkSchemas import NO_CONTENT_RESULT
+from utils.browser_pool import browser_pool
+from utils.checker_factory import get_harmful_checker
+from utils.extraction import load_encoding
+from utils.job_queue import PRIORITIES, claim_job, complete_job, fail_job, requeue_stale_jobs
+
+load_dotenv(override=True)
+
+# Configurations
+JOB_WORKERS = int(getenv("JOB_WORKERS", "4"))
+JOB_BULK_WORKERS = int(getenv("JOB_BULK_WORKERS", "1"))  # workers that prefer the bulk lane
+JOB_POLL_INTERVAL = float(getenv("JOB_POLL_INTERVAL", "1"))  # seconds
+
+INTERACTIVE_FIRST = [PRIORITIES["interactive"], PRIORITIES["bulk"]]
+BULK_FIRST = [PRIORITIES["bulk"], PRIORITIES["interactive"]]
+
+
+async def _claim(lanes: list[int]) -> Optional[tuple]:
+    async with AsyncSessionLocal() as db:
+        job = await claim_job(db, lanes)
+        if job is None:
+            return None
+        return job.id, job.url, job.bypass_cache, job.user_id
+
+
+async def _finish(job_id, result: Optional[dict], error: Optional[str]) -> None:
+    async with AsyncSessionLocal() as db:
+        job = await db.get(CheckJob, job_id)
+        if result is not None:
+            await complete_job(db, job, result)
+        else:
+            await fail_job(db, job, error)
+
+
+async def _requeue_stale() -> int:
+    async with AsyncSessionLocal() as db:
+        return await requeue_stale_jobs(db)
+
+
+async def run_worker(name: str, lanes: list[int], stopping: asyncio.Event) -> None:
+    """Claim and run jobs until ``stopping`` is set; the job in hand is always finished first."""
+    while not stopping.is_set():
+        try:
+            claimed = await _claim(lanes)
+        except Exception as e:
+            logger.error(f"[JobWorker {name}] Failed to claim job: {e}")
+            claimed = None
+        if claimed is None:
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        job_id, url, bypass_cache, user_id = claimed
+        logger.info(f"[JobWorker {name}] Running job {job_id} for {url}")
+        result, error = None, None
+        try:
+            harmful_result = await get_harmful_checker().aharmful_checker(url, bypass_cache=bypass_cache, user_id=user_id)
+            # Same answer as /check_harmful; an unreadable page is not retried
+            result = NO_CONTENT_RESULT if harmful_result is None else harmful_result.model_dump()
+        except Exception as e:
+            logger.error(f"[JobWorker {name}] Job {job_id} failed: {e}")
+            error = str(e)
+        try:
+            await _finish(job_id, result, error)
+        except Exception as e:
+            # The job stays running and is re-queued once it goes stale
+            logger.error(f"[JobWorker {name}] Failed to record result of job {job_id}: {e}")
+
+
+async def reap_stale_jobs(stopping: asyncio.Event) -> None:
+    while not stopping.is_set():
+        try:
+            count = await _requeue_stale()
+            if count:
+                logger.warning(f"[JobWorker] Re-queued {count} stale job(s)")
+        except Exception as e:
+            logger.error(f"[JobWorker] Failed to re-queue stale jobs: {e}")
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=60)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main(workers: int, bulk_workers: int) -> None:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    # Built off the loop: it loads the prefilter lists
+    await asyncio.to_thread(get_harmful_checker)
+    await asyncio.to_thread(load_encoding)
+    await asyncio.to_thread(browser_pool.start)
+    bulk_workers = min(bulk_workers, workers)
+    tasks = [
+        asyncio.create_task(run_worker(str(i), BULK_FIRST if i < bulk_workers else INTERACTIVE_FIRST, stopping))
+        for i in range(workers)
+    ]
+    tasks.append(asyncio.create_task(reap_stale_jobs(stopping)))
+    logger.info(f"[JobWorker] Started {workers} worker(s), {bulk_workers} preferring the bulk lane")
+    await asyncio.gather(*tasks)
+    await asyncio.to_thread(get_harmful_checker().close)
+    await asyncio.to_thread(browser_pool.shutdown)
+    await async_engine.dispose()
+    logger.info("[JobWorker] Stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run harmful check jobs queued through POST /api/v1/jobs.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="Jobs processed concurrently")
+    parser.add_argument("--bulk-workers", type=int, default=JOB_BULK_WORKERS, help="Workers that take bulk jobs first")
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.bulk_workers))